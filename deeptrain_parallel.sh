@@ -0,0 +1,3 @@
+#!/bin/bash
+
+ros2 run robot_hide_seek deeptrain_parallel "$@"
@@ -24,11 +24,13 @@ from launch.actions import IncludeLaunchDescription
 from launch.launch_description_sources import PythonLaunchDescriptionSource
 from launch.substitutions import ThisLaunchFileDir
 from launch.actions import ExecuteProcess
+from launch.conditions import IfCondition, UnlessCondition
 from launch.substitutions import LaunchConfiguration
 
 
 def generate_launch_description():
     use_sim_time = LaunchConfiguration('use_sim_time', default='True')
+    gui = LaunchConfiguration('gui', default='True')
     world_file_name = os.environ['HIDE_SEEK_WORLD']
     world = os.path.join(get_package_share_directory('robot_hide_seek'), 'worlds', world_file_name)
     launch_file_dir = os.path.join(get_package_share_directory('robot_hide_seek'), 'launch')
@@ -36,7 +38,13 @@ def generate_launch_description():
     return LaunchDescription([
         ExecuteProcess(
             cmd=['gazebo', world, '-s', 'libgazebo_ros_init.so'],
-            output='screen'),
+            output='screen',
+            condition=IfCondition(gui)),
+
+        ExecuteProcess(
+            cmd=['gzserver', world, '-s', 'libgazebo_ros_init.so'],
+            output='screen',
+            condition=UnlessCondition(gui)),
 
         ExecuteProcess(
             cmd=['ros2', 'param', 'set', '/gazebo', 'use_sim_time', use_sim_time],
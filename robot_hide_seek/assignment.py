@@ -0,0 +1,85 @@
+'''
+Seeker to hider assignment computed by the game controller, replacing the greedy choice
+each seeker made from the distances broadcast on /seekers.
+'''
+
+from math import inf
+
+import numpy as np
+
+from robot_hide_seek.utils import *
+
+# Cost of a pair where the seeker does not see the hider, such pairs are never kept
+UNSEEN_COST = 1e9
+
+def hungarian(cost):
+    # Minimum cost assignment (Kuhn-Munkres with potentials), column of each row or -1
+    cost = np.asarray(cost, dtype=float)
+
+    if cost.shape[0] > cost.shape[1]:
+        rows = [-1 for i in range(cost.shape[0])]
+
+        for j, i in enumerate(hungarian(cost.T)):
+            if i >= 0:
+                rows[i] = j
+
+        return rows
+
+    n, m = cost.shape
+
+    # Index 0 is a virtual column/row, p[j] is the row (1-based) matched to column j
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=int)
+    way = np.zeros(m + 1, dtype=int)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, inf)
+        used = np.zeros(m + 1, dtype=bool)
+
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+
+            candidates = np.where(free, minv[1:], inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+
+            j0 = j1
+
+            if p[j0] == 0:
+                break
+
+        # Augmenting path back to the virtual column
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    res = [-1 for i in range(n)]
+
+    for j in range(1, m + 1):
+        if p[j]:
+            res[p[j] - 1] = j - 1
+
+    return res
+
+def assign_targets(distances, visible):
+    # distances and visible as (seekers, hiders), hider followed by each seeker or -1
+    visible = np.asarray(visible) & np.isfinite(distances)
+    cost = np.where(visible, distances, UNSEEN_COST)
+    targets = hungarian(cost)
+
+    return [target if target >= 0 and visible[i][target] else -1 for i, target in enumerate(targets)]
@@ -0,0 +1,92 @@
+'''
+Load test of the game controller in team_poses mode. For each robot count (half hiders, half
+seekers) a controller is built on the intra-process bus, fed random team poses, and every
+tick (angles, visibility, distances, game over check, assignment and one message per robot)
+is timed, as well as the update from the two PoseArray messages.
+Usage: ros2 run robot_hide_seek bench_controller [n_ticks] [n_robots ...]
+'''
+
+import sys
+import time
+
+import numpy as np
+
+import rclpy
+from geometry_msgs.msg import Pose, PoseArray
+
+from robot_hide_seek.utils import *
+from robot_hide_seek import intra
+from robot_hide_seek.game_controller import HideSeek
+from robot_hide_seek.latency import LatencyRecorder
+
+ROBOT_COUNTS = [10, 100, 500]
+
+class BenchHideSeek(HideSeek):
+
+    def __init__(self, n_hiders, n_seekers):
+        super().__init__('', [0.0, 0.0], intra.IntraProcessBus(), 1.0, n_hiders, n_seekers, True)
+        self.endgames = 0
+
+    def endgame(self, msg='Game Over'):
+        # Random poses catch hiders all the time, the game keeps going
+        self.endgames += 1
+
+def random_poses(rng, n):
+    msg = PoseArray()
+
+    for x, y, yaw in zip(rng.uniform(-1, 1, n), rng.uniform(-1, 1, n), rng.uniform(-pi, pi, n)):
+        pose = Pose()
+        pose.position.x = float(x)
+        pose.position.y = float(y)
+        pose.orientation.z = float(np.sin(yaw / 2))
+        pose.orientation.w = float(np.cos(yaw / 2))
+        msg.poses.append(pose)
+
+    return msg
+
+def run(rng, n_robots, n_ticks):
+    n_hiders = n_robots // 2
+    n_seekers = n_robots - n_hiders
+
+    hide_seek = BenchHideSeek(n_hiders, n_seekers)
+    hide_seek.hider_started = True
+    hide_seek.seeker_started = True
+    hide_seek.time = SECONDS_SEEKER_START
+
+    latency = LatencyRecorder(n_ticks)
+
+    for i in range(n_ticks):
+        hiders = random_poses(rng, n_hiders)
+        seekers = random_poses(rng, n_seekers)
+
+        start = time.perf_counter()
+        hide_seek.hiders_pos_callback(hiders)
+        hide_seek.seekers_pos_callback(seekers)
+        latency.record('poses', time.perf_counter() - start)
+
+        start = time.perf_counter()
+        hide_seek.tick()
+        latency.record('tick', time.perf_counter() - start)
+
+    hide_seek.destroy_node()
+
+    return latency
+
+def main(args=None):
+    n_ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    counts = [int(n) for n in sys.argv[2:]] or ROBOT_COUNTS
+
+    rclpy.init(args=args)
+
+    rng = np.random.RandomState(0)
+
+    for n_robots in counts:
+        latency = run(rng, n_robots, n_ticks)
+        print(str(n_robots) + ' robots (' + str((n_robots // 2) * (n_robots - n_robots // 2)) + ' pairs):')
+        print(latency.format_summary())
+
+    rclpy.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+'''
+Startup time and memory of the game run as separate processes (as run_game.sh: one per robot
+plus the game controller) against the composed game entry point. Each setup is started, timed
+until every node is in the ROS graph and every model is loaded, and the resident memory of all
+its processes is summed.
+Usage: ros2 run robot_hide_seek bench_game [n_hiders] [n_seekers]
+'''
+
+import os
+import re
+import sys
+import time
+import signal
+import subprocess
+import threading
+
+import rclpy
+from rclpy.node import Node
+
+from robot_hide_seek.utils import *
+
+STARTUP_TIMEOUT = 120
+SETTLE_TIME = 2.0
+NODE_NAME = re.compile(r'^((hider|seeker)(_\d+)?|hide_seek)$')
+MODEL_LOADED = 'model weights.'
+
+def separate_commands(n_hiders, n_seekers):
+    commands = [['ros2', 'run', 'robot_hide_seek', 'hider', '--ros-args', '-p', 'id:=' + str(i)] for i in range(n_hiders)]
+    commands += [['ros2', 'run', 'robot_hide_seek', 'seeker', '--ros-args', '-p', 'id:=' + str(i)] for i in range(n_seekers)]
+    commands.append(['ros2', 'run', 'robot_hide_seek', 'game_controller', '--ros-args',
+                     '-p', 'n_hiders:=' + str(n_hiders), '-p', 'n_seekers:=' + str(n_seekers)])
+
+    return commands
+
+def composed_commands(n_hiders, n_seekers):
+    return [['ros2', 'run', 'robot_hide_seek', 'game', '--ros-args',
+             '-p', 'n_hiders:=' + str(n_hiders), '-p', 'n_seekers:=' + str(n_seekers)]]
+
+def descendants(pid):
+    pids = [pid]
+
+    try:
+        for task in os.listdir('/proc/' + str(pid) + '/task'):
+            with open('/proc/' + str(pid) + '/task/' + task + '/children') as children:
+                for child in children.read().split():
+                    pids += descendants(int(child))
+    except OSError:
+        pass
+
+    return pids
+
+def rss(pid):
+    try:
+        with open('/proc/' + str(pid) + '/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    return 0
+
+def count_lines(process, counter, lock):
+    for line in process.stdout:
+        if MODEL_LOADED in line:
+            with lock:
+                counter[0] += 1
+
+def run(monitor, commands, n_nodes, n_models):
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    counter = [0]
+    lock = threading.Lock()
+
+    start = time.time()
+    processes = [subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env,
+                                  universal_newlines=True, start_new_session=True) for command in commands]
+
+    for process in processes:
+        threading.Thread(target=count_lines, args=(process, counter, lock), daemon=True).start()
+
+    startup = None
+
+    while time.time() - start < STARTUP_TIMEOUT:
+        names = [name for name in monitor.get_node_names() if NODE_NAME.match(name)]
+
+        with lock:
+            loaded = counter[0]
+
+        if len(names) >= n_nodes and loaded >= n_models:
+            startup = time.time() - start
+            break
+
+        time.sleep(0.05)
+
+    time.sleep(SETTLE_TIME)
+    memory = sum(rss(pid) for process in processes for pid in descendants(process.pid))
+
+    for process in processes:
+        os.killpg(process.pid, signal.SIGINT)
+    for process in processes:
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+
+    # Let the graph forget the nodes before the next run
+    time.sleep(SETTLE_TIME)
+
+    return startup, memory
+
+def main(args=None):
+    n_hiders = int(sys.argv[1]) if len(sys.argv) > 1 else N_HIDERS
+    n_seekers = int(sys.argv[2]) if len(sys.argv) > 2 else N_SEEKERS
+
+    rclpy.init(args=args)
+    monitor = Node('bench_game')
+
+    n_nodes = n_hiders + n_seekers + 1
+
+    setups = [
+        ('separate', separate_commands(n_hiders, n_seekers), n_hiders + n_seekers),
+        ('composed', composed_commands(n_hiders, n_seekers), 2),
+    ]
+
+    for name, commands, n_models in setups:
+        startup, memory = run(monitor, commands, n_nodes, n_models if GAME_USES_TRAINING else 0)
+        print(name + ': ' + str(len(commands)) + ' processes, startup ' +
+              ('%.1f' % startup + 's' if startup is not None else 'timed out') +
+              ', RSS ' + '%.0f' % (memory / 2 ** 20) + 'MiB')
+
+    monitor.destroy_node()
+    rclpy.shutdown()
+
+
+if __name__ == '__main__':
+    main()
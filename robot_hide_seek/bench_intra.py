@@ -0,0 +1,106 @@
+'''
+Compares the CPU time spent handling game-level messages over DDS loopback and over the
+intra-process bus. A controller node sends a positions message to each robot's /game topic
+and a clock tick, then waits until every robot has handled them, as in one environment step.
+Usage: ros2 run robot_hide_seek bench_intra [n_messages]
+'''
+
+import sys
+import time
+import threading
+
+import rclpy
+from rclpy.node import Node
+
+from std_msgs.msg import String
+from rosgraph_msgs.msg import Clock
+
+from robot_hide_seek.utils import *
+from robot_hide_seek import intra
+
+N_ROBOTS = N_HIDERS + N_SEEKERS
+
+class Receiver(Node):
+
+    def __init__(self, id, bus, done):
+        super().__init__('bench_robot_' + str(id))
+
+        self.done = done
+
+        self.game_sub = intra.create_subscription(self, bus, String, '/bench_' + str(id) + '/game', self.callback, 10)
+        self.clock_sub = intra.create_subscription(self, bus, Clock, '/bench_clock', self.callback, 10)
+
+    def callback(self, msg):
+        self.done.release()
+
+def positions_message():
+    message = POSITIONS_MSG_HEADER
+
+    for i in range(N_HIDERS):
+        message += '\n\nangle: ' + str(0.5 * i) + '\ndistance: ' + str(1.5 * i)
+
+    msg = String()
+    msg.data = message
+    return msg
+
+def run(n_messages, bus):
+    done = threading.Semaphore(0)
+
+    sender = Node('bench_controller')
+    receivers = [Receiver(i, bus, done) for i in range(N_ROBOTS)]
+
+    game_pub = [intra.create_publisher(sender, bus, String, '/bench_' + str(i) + '/game', 10) for i in range(N_ROBOTS)]
+    clock_pub = intra.create_publisher(sender, bus, Clock, '/bench_clock', 10)
+
+    executor = rclpy.executors.MultiThreadedExecutor(5)
+    for node in receivers:
+        executor.add_node(node)
+    thread = threading.Thread(target=executor.spin, daemon=True)
+    thread.start()
+
+    # DDS discovery has to match every publisher before messages are delivered
+    if bus is None:
+        while any(pub.get_subscription_count() == 0 for pub in game_pub) or clock_pub.get_subscription_count() < N_ROBOTS:
+            time.sleep(0.1)
+
+    msg = positions_message()
+    clock = Clock()
+
+    start_cpu = time.process_time()
+    start_wall = time.time()
+
+    for i in range(n_messages):
+        clock.clock.nanosec = i
+        clock_pub.publish(clock)
+
+        for pub in game_pub:
+            pub.publish(msg)
+
+        for _ in range(2 * N_ROBOTS):
+            done.acquire()
+
+    cpu = time.process_time() - start_cpu
+    wall = time.time() - start_wall
+
+    executor.shutdown()
+    for node in receivers:
+        node.destroy_node()
+    sender.destroy_node()
+
+    return cpu, wall
+
+def main(args=None):
+    n_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    rclpy.init(args=args)
+
+    for name, bus in [('dds', None), ('intra', intra.IntraProcessBus())]:
+        cpu, wall = run(n_messages, bus)
+        print(name + ': ' + '%.1f' % (cpu / n_messages * 1e6) + 'us cpu/step ' +
+              '%.1f' % (wall / n_messages * 1e6) + 'us wall/step (' + str(N_ROBOTS + 1) + ' messages each)')
+
+    rclpy.shutdown()
+
+
+if __name__ == '__main__':
+    main()
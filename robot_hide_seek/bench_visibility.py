@@ -0,0 +1,125 @@
+'''
+Microbenchmark of visibility.can_see / can_see_batch against utils.can_see on random
+sightlines inside the arena. Results of both implementations are checked to be identical.
+When wall counts are given, WallSet and WallGrid are also compared on random mazes of that size.
+Usage: ros2 run robot_hide_seek bench_visibility [n_sightlines] [n_walls ...]
+'''
+
+import sys
+import time
+from math import ceil, sqrt
+
+import numpy as np
+
+from robot_hide_seek import utils, visibility
+from robot_hide_seek.utils import *
+
+MAZE_SIGHTLINES = 2000
+
+def random_sightlines(rng, n, limit=2.5):
+    pos1 = rng.uniform(-limit, limit, (n, 3))
+    pos2 = rng.uniform(-limit, limit, (n, 3))
+    pos1[:, 2] = 0
+    pos2[:, 2] = 0
+    # Twice the field of view, so about half of the sightlines are rejected by the angle check
+    angles = rng.uniform(-2 * FOV_ANGLE, 2 * FOV_ANGLE, n)
+
+    return angles, pos1, pos2
+
+def random_maze(rng, n_walls):
+    # Unit walls on the edges of a square grid centered on the origin
+    side = ceil(sqrt(n_walls / 2)) + 1
+    walls = []
+
+    while len(walls) < n_walls:
+        x, y = rng.randint(side), rng.randint(side)
+        x0, y0 = x - side / 2, y - side / 2
+
+        if rng.uniform() < 0.5:
+            walls.append([[x0, y0], [x0 + 1, y0]])
+        else:
+            walls.append([[x0, y0], [x0, y0 + 1]])
+
+    return walls, side / 2
+
+def reference_can_see(walls, angle, pos1, pos2):
+    if not -FOV_ANGLE <= angle <= FOV_ANGLE:
+        return False
+
+    for wall in walls:
+        if doIntersect(pos1, pos2, wall[0], wall[1]):
+            return False
+
+    return True
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def mismatches(reference, results):
+    return sum(a != b for a, b in zip(reference, results))
+
+def bench_arena(rng, n):
+    angles, pos1, pos2 = random_sightlines(rng, n)
+
+    # Lists, as HideSeek stores positions
+    angles_list = angles.tolist()
+    pos1_list = pos1.tolist()
+    pos2_list = pos2.tolist()
+
+    reference, reference_time = timed(lambda: [utils.can_see(angles_list[i], pos1_list[i], pos2_list[i]) for i in range(n)])
+    single, single_time = timed(lambda: [visibility.can_see(angles_list[i], pos1_list[i], pos2_list[i]) for i in range(n)])
+    batch, batch_time = timed(lambda: visibility.can_see_batch(angles, pos1, pos2))
+
+    errors = mismatches(reference, single) + mismatches(reference, batch.tolist())
+
+    print(str(n) + ' sightlines, ' + str(len(visibility.ARENA_WALLS)) + ' walls, ' + str(errors) + ' mismatches')
+    print('utils.can_see:            ' + '%.2f' % (reference_time / n * 1e6) + 'us/sightline')
+    print('visibility.can_see:       ' + '%.2f' % (single_time / n * 1e6) + 'us/sightline')
+    print('visibility.can_see_batch: ' + '%.2f' % (batch_time / n * 1e6) + 'us/sightline')
+
+    return errors
+
+def bench_maze(rng, n_walls):
+    n = MAZE_SIGHTLINES
+    walls, limit = random_maze(rng, n_walls)
+    angles, pos1, pos2 = random_sightlines(rng, n, limit)
+
+    angles_list = angles.tolist()
+    pos1_list = pos1.tolist()
+    pos2_list = pos2.tolist()
+
+    wall_set = visibility.WallSet(walls)
+    wall_grid, grid_build = timed(lambda: visibility.WallGrid(walls))
+
+    reference, reference_time = timed(lambda: [reference_can_see(walls, angles_list[i], pos1_list[i], pos2_list[i]) for i in range(n)])
+    batch, batch_time = timed(lambda: wall_set.can_see_batch(angles, pos1, pos2))
+    grid, grid_time = timed(lambda: [wall_grid.can_see(angles_list[i], pos1_list[i], pos2_list[i]) for i in range(n)])
+
+    errors = mismatches(reference, batch.tolist()) + mismatches(reference, grid)
+
+    print(str(n_walls) + ' walls (' + str(wall_grid.nx) + 'x' + str(wall_grid.ny) + ' grid, built in ' +
+          '%.1f' % (grid_build * 1000) + 'ms), ' + str(errors) + ' mismatches')
+    print('    loop:           ' + '%.2f' % (reference_time / n * 1e6) + 'us/sightline')
+    print('    WallSet batch:  ' + '%.2f' % (batch_time / n * 1e6) + 'us/sightline')
+    print('    WallGrid:       ' + '%.2f' % (grid_time / n * 1e6) + 'us/sightline')
+
+    return errors
+
+def main(args=None):
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    rng = np.random.RandomState(0)
+
+    errors = bench_arena(rng, n)
+
+    for n_walls in sys.argv[2:]:
+        errors += bench_maze(rng, int(n_walls))
+
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,8 @@ from keras.regularizers import l2
 
 import tensorflow as tf
 
+from robot_hide_seek.utils import LIDAR_SECTORS
+
 config = tf.compat.v1.ConfigProto()
 config.gpu_options.allow_growth = True
 session = tf.compat.v1.Session(config=config)
@@ -31,6 +33,7 @@ class Memory:
     Instead of using tuples (as other implementations do), the information is stored in lists 
     that get returned as another list of dictionaries with each key corresponding to either 
     "state", "action", "reward", "nextState" or "isFinal".
+    "repeat" is the number of periods the action was held, the next state is that many steps away.
     """
     def __init__(self, size):
         self.size = size
@@ -40,21 +43,22 @@ class Memory:
         self.rewards = []
         self.newStates = []
         self.finals = []
+        self.repeats = []
 
     def getMiniBatch(self, size) :
         indices = random.sample(set(np.arange(len(self.states))), min(size,len(self.states)))
         miniBatch = []
         for index in indices:
-            miniBatch.append({'state': self.states[index],'action': self.actions[index], 'reward': self.rewards[index], 'newState': self.newStates[index], 'isFinal': self.finals[index]})
+            miniBatch.append({'state': self.states[index],'action': self.actions[index], 'reward': self.rewards[index], 'newState': self.newStates[index], 'isFinal': self.finals[index], 'repeat': self.repeats[index]})
         return miniBatch
 
     def getCurrentSize(self) :
         return len(self.states)
 
     def getMemory(self, index): 
-        return {'state': self.states[index],'action': self.actions[index], 'reward': self.rewards[index], 'newState': self.newStates[index], 'isFinal': self.finals[index]}
+        return {'state': self.states[index],'action': self.actions[index], 'reward': self.rewards[index], 'newState': self.newStates[index], 'isFinal': self.finals[index], 'repeat': self.repeats[index]}
 
-    def addMemory(self, state, action, reward, newState, isFinal) :
+    def addMemory(self, state, action, reward, newState, isFinal, repeat=1) :
         if (self.currentPosition >= self.size - 1) :
             self.currentPosition = 0
         if (len(self.states) > self.size) :
@@ -63,12 +67,14 @@ class Memory:
             self.rewards[self.currentPosition] = reward
             self.newStates[self.currentPosition] = newState
             self.finals[self.currentPosition] = isFinal
+            self.repeats[self.currentPosition] = repeat
         else :
             self.states.append(state)
             self.actions.append(action)
             self.rewards.append(reward)
             self.newStates.append(newState)
             self.finals.append(isFinal)
+            self.repeats.append(repeat)
         
         self.currentPosition += 1
 
@@ -207,15 +213,15 @@ class DeepQ:
         self.backupNetwork(self.model, self.targetModel)
 
     def cleanInput(self, input):
-        for i in range(8):
+        for i in range(LIDAR_SECTORS):
             if math.isinf(input[i]):
                 input[i] = 25
 
-        if math.isinf(input[8]):
-            input[8] = np.random.uniform(6.28, 12.56)
+        if math.isinf(input[LIDAR_SECTORS]):
+            input[LIDAR_SECTORS] = np.random.uniform(6.28, 12.56)
 
-        if math.isinf(input[9]):
-            input[9] = 25
+        if math.isinf(input[LIDAR_SECTORS + 1]):
+            input[LIDAR_SECTORS + 1] = 25
 
         return input
 
@@ -239,14 +245,14 @@ class DeepQ:
         return np.argmax(qValues)
 
     # calculate the target function
-    def calculateTarget(self, qValuesNewState, reward, isFinal):
+    def calculateTarget(self, qValuesNewState, reward, isFinal, repeat=1):
         """
-        target = reward(s,a) + gamma * max(Q(s')
+        target = reward(s,a) + gamma^repeat * max(Q(s')
         """
         if isFinal:
             return reward
         else : 
-            return reward + self.discountFactor * self.getMaxQ(qValuesNewState)
+            return reward + self.discountFactor ** repeat * self.getMaxQ(qValuesNewState)
 
     # select the action with the highest Q value
     def selectAction(self, qValues, explorationRate):
@@ -283,8 +289,8 @@ class DeepQ:
                 return i
             i += 1
 
-    def addMemory(self, state, action, reward, newState, isFinal):
-        self.memory.addMemory(state, action, reward, newState, isFinal)
+    def addMemory(self, state, action, reward, newState, isFinal, repeat=1):
+        self.memory.addMemory(state, action, reward, newState, isFinal, repeat)
 
     def learnOnLastState(self):
         if self.memory.getCurrentSize() >= 1:
@@ -303,13 +309,14 @@ class DeepQ:
                 action = sample['action']
                 reward = sample['reward']
                 newState = sample['newState']
+                repeat = sample['repeat']
 
                 qValues = self.getQValues(state)
                 if useTargetNetwork:
                     qValuesNewState = self.getTargetQValues(newState)
                 else :
                     qValuesNewState = self.getQValues(newState)
-                targetValue = self.calculateTarget(qValuesNewState, reward, isFinal)
+                targetValue = self.calculateTarget(qValuesNewState, reward, isFinal, repeat)
 
                 X_batch = np.append(X_batch, np.array([state.copy()]), axis=0)
                 Y_sample = qValues.copy()
@@ -326,19 +333,40 @@ class DeepQ:
             self.model.save_weights(os.path.join(self.save_path, "model/model"))
             self.targetModel.save_weights(os.path.join(self.save_path, "targetModel/targetModel"))
 
-    def initPlay(self, hiddenLayers = [300,300]):
+    def initPlay(self, hiddenLayers = [300,300], strict=False):
+        # strict: raise instead of playing with random weights when they cannot be loaded
         model = self.createModel(self.input_size, self.output_size, hiddenLayers, "relu", self.learningRate)
 
         try:
             model.load_weights(os.path.join(self.save_path, "model/model"))
             print("Loaded model weights.")
         except:
+            if strict:
+                raise
             print("Could not load model weights.")
 
         self.model = model
 
+    def reloadWeights(self):
+        # Into the model built by initPlay, which keeps its weights when the checkpoint cannot be read
+        weights = self.model.get_weights()
+
+        try:
+            self.model.load_weights(os.path.join(self.save_path, "model/model"))
+        except:
+            self.model.set_weights(weights)
+            raise
+
+        print("Loaded model weights.")
+
     def predict(self, observation):
         observation = self.cleanInput(observation)
         observation = np.array(observation)
         predicted = self.model.predict(observation.reshape(1,len(observation)))
-        return np.argmax(predicted[0])
\ No newline at end of file
+        return np.argmax(predicted[0])
+
+    def predictBatch(self, observations):
+        # One forward pass for several observations, action of each
+        batch = np.array([self.cleanInput(list(observation)) for observation in observations])
+        predicted = self.model.predict(batch)
+        return np.argmax(predicted, axis=1)
\ No newline at end of file
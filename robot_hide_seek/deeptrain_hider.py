@@ -21,12 +21,15 @@ explorationRate = 1
 minibatch_size = 1
 learnStart = 0
 learningRate = 0.00025
-discountFactor = 0.99
+discountFactor = DISCOUNT_FACTOR
 memorySize = 100000
 
-deepQ = deepqlearn.DeepQ(11, 5, memorySize, discountFactor, learningRate, learnStart, './training_results/hider')
+deepQ = deepqlearn.DeepQ(OBSERVATION_SIZE, 5, memorySize, discountFactor, learningRate, learnStart, './training_results/hider')
 deepQ.initNetworks([300,300])
 
+# Phase timings, only collected when PROFILE_STEPS is True
+profiler = env.unwrapped.profiler
+
 def saveScores(scores):
     csv_columns = ['epoch','average_reward','final_reward']
     try:
@@ -44,7 +47,7 @@ def round_observation(observation):
     for sensor in observation[0]:
         res.append(round(sensor, 2))
 
-    for _ in range(len(observation[0]), 8):
+    for _ in range(len(observation[0]), LIDAR_SECTORS):
         res.append(math.inf)
 
     res.append(round(observation[1], 2))
@@ -63,44 +66,52 @@ for epoch in range(epochs):
     for i, observation in enumerate(observations):
         observations[i] = round_observation(observation)
 
-    current_hider = 0
     done = False
 
     sum_reward = 0.0
     t = 0
     while not done:
-        qValues = deepQ.getQValues(observations[current_hider])
+        actions = []
+
+        with profiler.phase('select_action'):
+            for observation in observations:
+                qValues = deepQ.getQValues(observation)
+                actions.append(deepQ.selectAction(qValues, explorationRate))
+
+        # Every hider acts at the same time
+        newObservations, rewards, dones, info = env.step_all(actions)
 
-        action = deepQ.selectAction(qValues, explorationRate)
+        for i, newObservation in enumerate(newObservations):
+            newObservation = round_observation(newObservation)
 
-        newObservation, reward, done, info = env.step(action)
+            deepQ.addMemory(observations[i], actions[i], rewards[i], newObservation, dones[i], info['repeat'])
 
-        newObservation = round_observation(newObservation)
+            with profiler.phase('learn'):
+                if stepCounter >= learnStart:
+                    if stepCounter <= updateTargetNetwork:
+                        deepQ.learnOnMiniBatch(minibatch_size, False)
+                    else:
+                        deepQ.learnOnMiniBatch(minibatch_size, True)
 
-        deepQ.addMemory(observations[current_hider], action, reward, newObservation, done)
+            observations[i] = newObservation
 
-        if stepCounter >= learnStart:
-            if stepCounter <= updateTargetNetwork:
-                deepQ.learnOnMiniBatch(minibatch_size, False)
-            else:
-                deepQ.learnOnMiniBatch(minibatch_size, True)
+            stepCounter += 1
+            if stepCounter % updateTargetNetwork == 0:
+                deepQ.updateTargetNetwork()
 
-        observations[current_hider] = newObservation
-        current_hider = (current_hider + 1) % N_HIDERS
-        t += 1
-        sum_reward += reward
+        done = any(dones)
+        t += len(rewards)
+        sum_reward += sum(rewards)
 
         if done:
             deepQ.saveModel()
-            sum_reward -= reward
-            scores.append({'epoch': epoch, 'average_reward': sum_reward/(t-1), 'final_reward': reward})
-            print("Episode " + str(epoch) + " finished after {} timesteps".format(t+1) + ". Average Reward: " + str(sum_reward/(t-1)))
-            saveScores(scores)
-            break
+            reward = sum(rewards) / len(rewards)
+            sum_reward -= sum(rewards)
+            average_reward = sum_reward / max(1, t - len(rewards))
 
-        stepCounter += 1
-        if stepCounter % updateTargetNetwork == 0:
-            deepQ.updateTargetNetwork()
+            scores.append({'epoch': epoch, 'average_reward': average_reward, 'final_reward': reward})
+            print("Episode " + str(epoch) + " finished after {} timesteps".format(t) + ". Average Reward: " + str(average_reward))
+            saveScores(scores)
 
     explorationRate *= 0.999
     explorationRate = max(0.05, explorationRate)
\ No newline at end of file
@@ -0,0 +1,101 @@
+'''
+Adapted from https://github.com/vmayoral/basic_reinforcement_learning
+
+Central Deep Q-Learn learner fed by a pool of simulation workers.
+Usage: deeptrain_parallel <seeker|hider> [n_workers]
+'''
+
+import sys
+import numpy as np
+import csv
+
+from robot_hide_seek import deepqlearn, worker_pool
+from robot_hide_seek.utils import *
+
+updateTargetNetwork = 10
+minibatch_size = 1
+learnStart = 0
+learningRate = 0.00025
+discountFactor = DISCOUNT_FACTOR
+memorySize = 100000
+saveEvery = 1000
+
+def saveScores(scores, path):
+    csv_columns = ['epoch','worker','average_reward','final_reward']
+    try:
+        with open(path, 'w') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=csv_columns)
+            writer.writeheader()
+            for data in scores:
+                writer.writerow(data)
+    except IOError:
+        pass
+
+def main(args=None):
+    role = sys.argv[1] if len(sys.argv) > 1 else 'seeker'
+    n_workers = int(sys.argv[2]) if len(sys.argv) > 2 else N_WORKERS
+
+    save_path = worker_pool.ROLES[role][1]
+
+    deepQ = deepqlearn.DeepQ(OBSERVATION_SIZE, 5, memorySize, discountFactor, learningRate, learnStart, save_path)
+    deepQ.initNetworks([300,300])
+    # Workers load their first weights from disk
+    deepQ.saveModel()
+
+    pool = worker_pool.WorkerPool(role, n_workers)
+    pool.start()
+
+    explorationRate = 1
+    scores = []
+    episode_rewards = [[] for i in range(n_workers)]
+    stepCounter = 0
+    epoch = 0
+
+    try:
+        while True:
+            pool.supervise()
+
+            transition = pool.get_transition()
+
+            if transition is None:
+                continue
+
+            worker_id, observation, action, reward, newObservation, done, repeat = transition
+
+            deepQ.addMemory(np.array(observation), action, reward, np.array(newObservation), done, repeat)
+
+            if stepCounter >= learnStart:
+                if stepCounter <= updateTargetNetwork:
+                    deepQ.learnOnMiniBatch(minibatch_size, False)
+                else:
+                    deepQ.learnOnMiniBatch(minibatch_size, True)
+
+            stepCounter += 1
+            if stepCounter % updateTargetNetwork == 0:
+                deepQ.updateTargetNetwork()
+            if stepCounter % saveEvery == 0:
+                deepQ.saveModel()
+
+            episode_rewards[worker_id].append(reward)
+
+            if done:
+                rewards = episode_rewards[worker_id]
+                average_reward = sum(rewards[:-1]) / max(1, len(rewards) - 1)
+
+                scores.append({'epoch': epoch, 'worker': worker_id, 'average_reward': average_reward, 'final_reward': reward})
+                print("Episode " + str(epoch) + " (worker " + str(worker_id) + ") finished after {} timesteps".format(len(rewards)) + ". Average Reward: " + str(average_reward))
+                saveScores(scores, role + 's_parallel.csv')
+
+                episode_rewards[worker_id] = []
+                epoch += 1
+
+                explorationRate *= 0.999
+                explorationRate = max(0.05, explorationRate)
+                pool.set_exploration_rate(explorationRate)
+
+    finally:
+        deepQ.saveModel()
+        pool.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+'''
+Stand-in for the Gazebo services and topics used by the game and the training
+environments, to test resets and environment plumbing without a simulation.
+Robots are moved with unicycle kinematics, LIDAR rays are cast against WALLS.
+'''
+
+from math import sin, cos, atan2, inf, pi
+
+import rclpy
+from rclpy.node import Node
+from rclpy.qos import qos_profile_sensor_data
+
+from std_srvs.srv import Empty
+from gazebo_msgs.srv import SetEntityState
+from rosgraph_msgs.msg import Clock
+from nav_msgs.msg import Odometry
+from sensor_msgs.msg import LaserScan
+from geometry_msgs.msg import Twist, Pose, PoseArray
+
+from functools import partial
+
+from robot_hide_seek.utils import *
+
+SIM_STEP = 0.01
+ODOM_PERIOD = 1 / 30
+SCAN_PERIOD = 1 / 5
+SCAN_SAMPLES = 360
+SCAN_RANGE_MIN = 0.12
+SCAN_RANGE_MAX = 3.5
+
+def cast_ray(pos, angle):
+    direction = [cos(angle), sin(angle)]
+    closest = inf
+
+    for wall in WALLS:
+        edge = [wall[1][0] - wall[0][0], wall[1][1] - wall[0][1]]
+        denominator = direction[0] * edge[1] - direction[1] * edge[0]
+
+        if denominator == 0:
+            continue
+
+        offset = [wall[0][0] - pos[0], wall[0][1] - pos[1]]
+        t = (offset[0] * edge[1] - offset[1] * edge[0]) / denominator
+        u = (offset[0] * direction[1] - offset[1] * direction[0]) / denominator
+
+        if t >= 0 and 0 <= u <= 1 and t < closest:
+            closest = t
+
+    if not SCAN_RANGE_MIN <= closest <= SCAN_RANGE_MAX:
+        return inf
+
+    return closest
+
+class FakeGazebo(Node):
+
+    def __init__(self):
+        super().__init__('gazebo')
+
+        self.declare_parameter('namespace', '')
+        self.namespace = self.get_parameter('namespace').value
+        self.declare_parameter('origin', [0.0, 0.0])
+        self.origin = self.get_parameter('origin').value
+        self.declare_parameter('speed', 1.0)
+        self.speed = self.get_parameter('speed').value
+        # Also publish every team's poses as one PoseArray, for the game controller's team_poses mode
+        self.declare_parameter('team_poses', False)
+        self.team_poses = self.get_parameter('team_poses').value
+
+        self.paused = False
+        self.sim_time = 0.0
+        self.next_odom = 0.0
+        self.next_scan = 0.0
+
+        self.poses = {robot: self.start_pose(robot) for robot in robot_names()}
+        self.velocities = {robot: [0.0, 0.0] for robot in self.poses}
+
+        self.pause_srv = self.create_service(Empty, '/pause_physics', self.pause_callback)
+        self.unpause_srv = self.create_service(Empty, '/unpause_physics', self.unpause_callback)
+        self.reset_srv = self.create_service(Empty, '/reset_simulation', self.reset_callback)
+        self.set_state_srv = self.create_service(SetEntityState, '/gazebo/set_entity_state', self.set_state_callback)
+
+        self.clock_pub = self.create_publisher(Clock, '/clock', 10)
+
+        self.vel_sub = [self.create_subscription(
+            Twist,
+            self.namespace + '/' + robot + '/cmd_vel',
+            partial(self.vel_callback, robot),
+            10
+        ) for robot in self.poses]
+
+        self.odom_pub = {robot: self.create_publisher(
+            Odometry,
+            self.namespace + '/' + robot + '/odom',
+            10
+        ) for robot in self.poses}
+
+        self.scan_pub = {robot: self.create_publisher(
+            LaserScan,
+            self.namespace + '/' + robot + '/scan',
+            qos_profile_sensor_data
+        ) for robot in self.poses}
+
+        self.team_pub = {team: self.create_publisher(
+            PoseArray,
+            self.namespace + '/' + team + 's/poses',
+            10
+        ) for team in ('hider', 'seeker')} if self.team_poses else {}
+
+        self.timer = self.create_timer(SIM_STEP / self.speed, self.step)
+
+    def start_pose(self, robot):
+        pose = START_POSES[robot]
+        return [pose[0] + self.origin[0], pose[1] + self.origin[1], pose[2]]
+
+    def pause_callback(self, request, response):
+        self.paused = True
+        return response
+
+    def unpause_callback(self, request, response):
+        self.paused = False
+        return response
+
+    def reset_callback(self, request, response):
+        self.sim_time = 0.0
+        self.next_odom = 0.0
+        self.next_scan = 0.0
+
+        for robot in self.poses:
+            self.poses[robot] = self.start_pose(robot)
+            self.velocities[robot] = [0.0, 0.0]
+
+        return response
+
+    def set_state_callback(self, request, response):
+        robot = request.state.name
+
+        if self.namespace:
+            robot = robot.replace(entity_name(self.namespace, ''), '', 1)
+
+        if robot not in self.poses:
+            response.success = False
+            return response
+
+        orientation = request.state.pose.orientation
+        self.poses[robot] = [request.state.pose.position.x, request.state.pose.position.y,
+                             2 * atan2(orientation.z, orientation.w)]
+        self.velocities[robot] = [request.state.twist.linear.x, request.state.twist.angular.z]
+
+        response.success = True
+        return response
+
+    def vel_callback(self, robot, msg):
+        self.velocities[robot] = [msg.linear.x, msg.angular.z]
+
+    def step(self):
+        if self.paused:
+            return
+
+        self.sim_time += SIM_STEP
+
+        for robot, pose in self.poses.items():
+            linear, angular = self.velocities[robot]
+            pose[0] += linear * cos(pose[2]) * SIM_STEP
+            pose[1] += linear * sin(pose[2]) * SIM_STEP
+            pose[2] = (pose[2] + angular * SIM_STEP + pi) % (2 * pi) - pi
+
+        clock = Clock()
+        clock.clock.sec = int(self.sim_time)
+        clock.clock.nanosec = int((self.sim_time % 1) * 1e9)
+        self.clock_pub.publish(clock)
+
+        if self.sim_time >= self.next_odom:
+            self.next_odom += ODOM_PERIOD
+            self.publish_odom(clock.clock)
+
+        if self.sim_time >= self.next_scan:
+            self.next_scan += SCAN_PERIOD
+            self.publish_scans(clock.clock)
+
+    def publish_odom(self, stamp):
+        for robot, pose in self.poses.items():
+            msg = Odometry()
+            msg.header.stamp = stamp
+            msg.pose.pose.position.x = pose[0]
+            msg.pose.pose.position.y = pose[1]
+            msg.pose.pose.orientation.z = sin(pose[2] / 2)
+            msg.pose.pose.orientation.w = cos(pose[2] / 2)
+            self.odom_pub[robot].publish(msg)
+
+        for team, pub in self.team_pub.items():
+            msg = PoseArray()
+            msg.header.stamp = stamp
+            # Poses are kept in robot_names() order, so index i is <team>_i
+            for robot in [robot for robot in self.poses if robot.startswith(team + '_')]:
+                pose = Pose()
+                pose.position.x = self.poses[robot][0]
+                pose.position.y = self.poses[robot][1]
+                pose.orientation.z = sin(self.poses[robot][2] / 2)
+                pose.orientation.w = cos(self.poses[robot][2] / 2)
+                msg.poses.append(pose)
+            pub.publish(msg)
+
+    def publish_scans(self, stamp):
+        increment = 2 * pi / SCAN_SAMPLES
+
+        for robot, pose in self.poses.items():
+            msg = LaserScan()
+            msg.header.stamp = stamp
+            msg.angle_min = 0.0
+            msg.angle_max = 2 * pi - increment
+            msg.angle_increment = increment
+            msg.range_min = SCAN_RANGE_MIN
+            msg.range_max = SCAN_RANGE_MAX
+            # WALLS are relative to the arena origin
+            pos = [pose[0] - self.origin[0], pose[1] - self.origin[1]]
+            msg.ranges = [cast_ray(pos, pose[2] + i * increment) for i in range(SCAN_SAMPLES)]
+            self.scan_pub[robot].publish(msg)
+
+def main(args=None):
+    rclpy.init(args=args)
+
+    fake_gazebo = FakeGazebo()
+
+    rclpy.spin(fake_gazebo)
+
+    fake_gazebo.destroy_node()
+    rclpy.shutdown()
+
+
+if __name__ == '__main__':
+    main()
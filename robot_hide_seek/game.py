@@ -0,0 +1,92 @@
+'''
+The whole game in one process: every hider and seeker node and the game controller under one
+multi-threaded executor, game-level channels on the intra-process bus. Each team loads its
+Deep Q-Learn model once and all its robots share it.
+Usage: ros2 run robot_hide_seek game --ros-args -p n_hiders:=2 -p n_seekers:=2
+'''
+
+import threading
+
+import rclpy
+from rclpy.node import Node
+
+from robot_hide_seek.utils import *
+from robot_hide_seek import intra, deepqlearn
+from robot_hide_seek.hider import Hider
+from robot_hide_seek.seeker import Seeker
+from robot_hide_seek.game_controller import HideSeek
+from robot_hide_seek.model_watcher import ModelWatcher
+
+class SharedPolicy:
+    """
+    One loaded network for a whole team. Robots predict from their own inference threads,
+    so calls are serialized.
+    """
+    def __init__(self, save_path):
+        self.deepQ = deepqlearn.DeepQ(OBSERVATION_SIZE, 5, save_path=save_path)
+        self.deepQ.initPlay()
+        self.lock = threading.Lock()
+        self.version = 0
+
+        self.watcher = ModelWatcher(save_path, self.swap) if WATCH_MODEL else None
+
+    def swap(self, deepQ):
+        # Loaded on the watcher's thread, only the reference changes here
+        self.deepQ = deepQ
+        self.version += 1
+
+    def predict(self, observation):
+        with self.lock:
+            return self.deepQ.predict(observation)
+
+def create_game(n_hiders=N_HIDERS, n_seekers=N_SEEKERS, namespace='', origin=None, tick_rate=GAME_TICK_RATE):
+    bus = intra.IntraProcessBus()
+
+    hider_policy = None
+    seeker_policy = None
+
+    if GAME_USES_TRAINING:
+        hider_policy = SharedPolicy('./training_results/hider')
+        seeker_policy = SharedPolicy('./training_results/seeker')
+
+    nodes = [Hider(i, namespace, bus, hider_policy) for i in range(n_hiders)]
+    nodes += [Seeker(i, namespace, bus, seeker_policy) for i in range(n_seekers)]
+    nodes.append(HideSeek(namespace, origin, bus, tick_rate, n_hiders, n_seekers))
+
+    return nodes
+
+def main(args=None):
+    rclpy.init(args=args)
+
+    params = Node('game')
+    params.declare_parameter('n_hiders', N_HIDERS)
+    params.declare_parameter('n_seekers', N_SEEKERS)
+    params.declare_parameter('namespace', '')
+    params.declare_parameter('origin', [0.0, 0.0])
+    params.declare_parameter('tick_rate', GAME_TICK_RATE)
+
+    nodes = create_game(params.get_parameter('n_hiders').value,
+                        params.get_parameter('n_seekers').value,
+                        params.get_parameter('namespace').value,
+                        params.get_parameter('origin').value,
+                        params.get_parameter('tick_rate').value)
+
+    executor = rclpy.executors.MultiThreadedExecutor()
+    for node in nodes:
+        executor.add_node(node)
+
+    try:
+        executor.spin()
+    except KeyboardInterrupt:
+        pass
+
+    for node in nodes:
+        if getattr(node, 'inference', None) is not None:
+            node.inference.stop()
+        node.destroy_node()
+    params.destroy_node()
+    rclpy.shutdown()
+
+
+if __name__ == '__main__':
+    main()
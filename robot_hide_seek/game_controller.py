@@ -1,35 +1,83 @@
 import rclpy
 from rclpy.node import Node
 
-from std_msgs.msg import String
+from std_msgs.msg import Empty
 from rosgraph_msgs.msg import Clock
 from nav_msgs.msg import Odometry
+from geometry_msgs.msg import PoseArray
 
 import math
 from functools import partial
 
+import numpy as np
+
 from robot_hide_seek.utils import *
+from robot_hide_seek import intra, game_msgs
+from robot_hide_seek.los_table import arena_visibility
+from robot_hide_seek.visibility import calc_angle_matrix
+from robot_hide_seek.assignment import assign_targets
 
 class HideSeek(Node):
     
-    def __init__(self):
-        super().__init__('hide_seek')
-
-        # self.declare_parameter('n_hiders')
-        # self.n_hiders = self.get_parameter('n_hiders').value
-        # self.declare_parameter('n_seekers')
-        # self.n_seekers = self.get_parameter('n_seekers').value
-        self.n_hiders = N_HIDERS
-        self.n_seekers = N_SEEKERS
+    def __init__(self, namespace=None, origin=None, bus=None, tick_rate=GAME_TICK_RATE,
+                 n_hiders=N_HIDERS, n_seekers=N_SEEKERS, team_poses=False):
+        if namespace is None:
+            super().__init__('hide_seek')
+            self.declare_parameter('namespace', '')
+            namespace = self.get_parameter('namespace').value
+            self.declare_parameter('origin', [0.0, 0.0])
+            origin = self.get_parameter('origin').value
+            self.declare_parameter('tick_rate', GAME_TICK_RATE)
+            tick_rate = self.get_parameter('tick_rate').value
+            self.declare_parameter('n_hiders', N_HIDERS)
+            n_hiders = self.get_parameter('n_hiders').value
+            self.declare_parameter('n_seekers', N_SEEKERS)
+            n_seekers = self.get_parameter('n_seekers').value
+            self.declare_parameter('team_poses', False)
+            team_poses = self.get_parameter('team_poses').value
+
+        else:
+            super().__init__('hide_seek', namespace=namespace or None)
+
+        # Each arena tiled in the world is played independently, with positions relative to its origin
+        self.namespace = namespace
+        self.origin = list(origin) if origin is not None else [0.0, 0.0]
+
+        # With tick_rate > 0 (Hz of simulated time), odometry only updates poses and every robot
+        # gets one update per tick. With 0, a robot's update is sent on each of its odom messages
+        self.tick_rate = tick_rate
+        self.next_tick = 0.0
+        # Without ticks, seekers are assigned ASSIGNMENT_RATE times per second of simulated time
+        self.next_assignment = 0.0
+
+        self.n_hiders = n_hiders
+        self.n_seekers = n_seekers
         
         self.hider_started = False
         self.seeker_started = False
 
-        self.hider_pos = [[0, 0, 0] for i in range(self.n_hiders)]
-        self.seeker_pos = [[0, 0, 0] for i in range(self.n_seekers)]
-        self.hider_yaw = [0 for i in range(self.n_hiders)]
-        self.seeker_yaw = [[0, 0, 0] for i in range(self.n_seekers)]
-
+        # Poses relative to the arena origin, updated in place
+        self.hider_pos = np.zeros((self.n_hiders, 3))
+        self.seeker_pos = np.zeros((self.n_seekers, 3))
+        self.hider_yaw = np.zeros(self.n_hiders)
+        self.seeker_yaw = np.zeros(self.n_seekers)
+
+        # Squared hider-seeker distances, inf until both poses are known. Odometry of a robot only
+        # updates its row (hider) or column (seeker)
+        self.hider_known = np.zeros(self.n_hiders, dtype=bool)
+        self.seeker_known = np.zeros(self.n_seekers, dtype=bool)
+        self.squared_distances = np.full((self.n_hiders, self.n_seekers), math.inf)
+        # (hider, seeker) that ended the game
+        self.caught = None
+        # Hider last assigned to each seeker, None until one was sent
+        self.targets = [None for i in range(self.n_seekers)]
+
+        # Precomputed line of sight table if one was built, exact tests otherwise
+        self.sight = arena_visibility(self.get_logger())
+
+        self.clock = -1
+        self.sim_time = 0.0
+        self.start_time = 0
         self.time = -1
 
         self.clock_sub = self.create_subscription(
@@ -38,46 +86,120 @@ class HideSeek(Node):
             self.clock_callback,
             10)
 
-        self.hider_pub = [self.create_publisher(
-            String,
-            '/hider_' + str(i) + '/game',
+        # With a bus the robots in this process get the clock from here, one DDS /clock reader per game
+        self.clock_pub = bus.create_publisher('/clock') if bus is not None else None
+
+        self.hider_pub = [intra.create_publisher(
+            self,
+            bus,
+            game_msgs.MSG_TYPE,
+            self.namespace + '/hider_' + str(i) + '/game',
             10
         ) for i in range(self.n_hiders)]
 
-        self.seeker_pub = [self.create_publisher(
-            String,
-            '/seeker_' + str(i) + '/game',
+        self.seeker_pub = [intra.create_publisher(
+            self,
+            bus,
+            game_msgs.MSG_TYPE,
+            self.namespace + '/seeker_' + str(i) + '/game',
             10
         ) for i in range(self.n_seekers)]
 
-        self.hider_pos_sub = [self.create_subscription(
-            Odometry,
-            '/hider_' + str(i) + '/odom',
-            partial(self.hider_pos_callback, i),
+        # With team_poses, one PoseArray per team (index i is robot i, world frame) instead of every
+        # robot's odometry. Poses of a whole team are updated at once, so without a tick rate each
+        # seekers message is a tick
+        if team_poses:
+            self.hider_pos_sub = self.create_subscription(
+                PoseArray,
+                self.namespace + '/hiders/poses',
+                self.hiders_pos_callback,
+                10
+            )
+
+            self.seeker_pos_sub = self.create_subscription(
+                PoseArray,
+                self.namespace + '/seekers/poses',
+                self.seekers_pos_callback,
+                10
+            )
+
+        else:
+            self.hider_pos_sub = [self.create_subscription(
+                Odometry,
+                self.namespace + '/hider_' + str(i) + '/odom',
+                partial(self.hider_pos_callback, i),
+                10
+            ) for i in range(self.n_hiders)]
+
+            self.seeker_pos_sub = [self.create_subscription(
+                Odometry,
+                self.namespace + '/seeker_' + str(i) + '/odom',
+                partial(self.seeker_pos_callback, i),
+                10
+            ) for i in range(self.n_seekers)]
+
+        self.reset_sub = self.create_subscription(
+            Empty,
+            self.namespace + '/reset',
+            self.reset_callback,
             10
-        ) for i in range(self.n_hiders)]
-
-        self.seeker_pos_sub = [self.create_subscription(
-            Odometry,
-            '/seeker_' + str(i) + '/odom',
-            partial(self.seeker_pos_callback, i),
-            10
-        ) for i in range(self.n_seekers)]
+        )
 
     def reset(self):
         self.hider_started = False
         self.seeker_started = False
-        self.hider_pos = [[0, 0, 0] for i in range(self.n_hiders)]
-        self.seeker_pos = [[0, 0, 0] for i in range(self.n_seekers)]
-        self.hider_yaw = [0 for i in range(self.n_hiders)]
-        self.seeker_yaw = [[0, 0, 0] for i in range(self.n_seekers)]
+        self.hider_pos[:] = 0
+        self.seeker_pos[:] = 0
+        self.hider_yaw[:] = 0
+        self.seeker_yaw[:] = 0
+        self.hider_known[:] = False
+        self.seeker_known[:] = False
+        self.squared_distances[:] = math.inf
+        self.caught = None
+        self.targets = [None for i in range(self.n_seekers)]
+        self.next_tick = 0.0
+        self.next_assignment = 0.0
+
+    def restart(self, elapsed=0, notify=True):
+        # elapsed > 0 resumes a game that was restored at that point in time
+        self.start_time = self.clock - elapsed
+        self.time = elapsed
+        self.reset()
+
+        # Robots hosted in the same process can be restarted directly instead
+        if not notify:
+            return
+
+        message = game_msgs.reset(elapsed)
 
+        for pub in self.hider_pub:
+            pub.publish(message)
+
+        for pub in self.seeker_pub:
+            pub.publish(message)
+
+    def reset_callback(self, msg):
+        self.restart()
 
     def clock_callback(self, msg):
-        if int(msg.clock.sec) < self.time:
+        if self.clock_pub is not None:
+            self.clock_pub.publish(msg)
+
+        if int(msg.clock.sec) < self.clock:
+            self.start_time = 0
             self.reset()
 
-        self.time = int(msg.clock.sec)
+        self.clock = int(msg.clock.sec)
+        self.sim_time = msg.clock.sec + msg.clock.nanosec * 1e-9
+        self.time = self.clock - self.start_time
+
+        if self.tick_rate > 0 and self.sim_time >= self.next_tick:
+            self.next_tick = self.sim_time + 1 / self.tick_rate
+            self.tick()
+
+        elif self.tick_rate <= 0 and CENTRAL_ASSIGNMENT and self.seeker_started and self.sim_time >= self.next_assignment:
+            self.next_assignment = self.sim_time + 1 / ASSIGNMENT_RATE
+            self.assign(np.sqrt(self.squared_distances), self.seeker_visibility())
 
         if self.time >= SECONDS_HIDER_START and not self.hider_started:
             self.hider_started = True
@@ -88,99 +210,180 @@ class HideSeek(Node):
         if self.time >= GAME_TIME_LIMIT:
             self.endgame('Hider wins')
 
-    def publish_str_msg(self, publisher, msg_data):
-        msg = String()
-        msg.data = msg_data
-        publisher.publish(msg)
-
     # def start_hider(self):
     #     self.hider_started = True
 
     #     for pub in self.hider_pub:
-    #         self.publish_str_msg(pub,START_MSG)
+    #         pub.publish(game_msgs.signal(START_MSG))
 
     # def start_seeker(self):
     #     self.seeker_started = True
 
     #     for pub in self.seeker_pub:
-    #         self.publish_str_msg(pub,START_MSG)
+    #         pub.publish(game_msgs.signal(START_MSG))
 
     def hider_pos_callback(self, id, msg):
-        self.hider_pos[id] = [msg.pose.pose.position.x, msg.pose.pose.position.y, msg.pose.pose.position.z]
+        self.hider_pos[id] = (msg.pose.pose.position.x - self.origin[0], msg.pose.pose.position.y - self.origin[1], msg.pose.pose.position.z)
         self.hider_yaw[id] = get_yaw(msg.pose.pose.orientation)
+        self.update_hider_distances(id)
 
-        if self.check_gameover():
+        if self.tick_rate > 0:
+            return
+
+        if self.check_gameover(hider=id):
             self.endgame('Seeker wins')
 
-        message = 'POSITIONS\n\n'
+        angles = calc_angle_matrix(self.hider_pos[id:id + 1], self.hider_yaw[id:id + 1], self.seeker_pos)[0]
+        # All opponents in one call
+        visible = self.sight.can_see_batch(angles, self.hider_pos[id], self.seeker_pos)
 
-        for i in range(self.n_seekers):
-            angle = calc_angle_robots(self.hider_pos[id], self.hider_yaw[id], self.seeker_pos[i])
-            
-            if can_see(angle, self.hider_pos[id], self.seeker_pos[i]):
-                distance = calc_distance(self.hider_pos[id], self.seeker_pos[i])
-
-                message += 'Angle: ' + str(angle) + '\nDistance: ' + str(distance) + '\n\n'
-                
-            else:
-                message += 'Angle: ' + str(math.inf) + '\nDistance: ' + str(math.inf) + '\n\n'
-            
-        self.publish_str_msg(self.hider_pub[id], message)
+        self.hider_pub[id].publish(positions_message(angles, np.sqrt(self.squared_distances[id]), visible))
 
     def seeker_pos_callback(self, id, msg):
-        self.seeker_pos[id] = [msg.pose.pose.position.x, msg.pose.pose.position.y, msg.pose.pose.position.z]
+        self.seeker_pos[id] = (msg.pose.pose.position.x - self.origin[0], msg.pose.pose.position.y - self.origin[1], msg.pose.pose.position.z)
         self.seeker_yaw[id] = get_yaw(msg.pose.pose.orientation)
+        self.update_seeker_distances(id)
 
-        if self.check_gameover():
+        if self.tick_rate > 0:
+            return
+
+        if self.check_gameover(seeker=id):
             self.endgame('Seeker wins')
 
-        message = POSITIONS_MSG_HEADER + '\n\n'
+        angles = calc_angle_matrix(self.seeker_pos[id:id + 1], self.seeker_yaw[id:id + 1], self.hider_pos)[0]
+        # All opponents in one call
+        visible = self.sight.can_see_batch(angles, self.seeker_pos[id], self.hider_pos)
+
+        self.seeker_pub[id].publish(positions_message(angles, np.sqrt(self.squared_distances[:, id]), visible))
+
+    def tick(self):
+        # Every pair at once, angles and visibility from each side and distances as (hiders, seekers)
+        hider_pos = self.hider_pos
+        seeker_pos = self.seeker_pos
+
+        hider_angles = calc_angle_matrix(hider_pos, self.hider_yaw, seeker_pos)
+        seeker_angles = calc_angle_matrix(seeker_pos, self.seeker_yaw, hider_pos)
+        distances = np.sqrt(self.squared_distances)
+
+        pos1 = np.repeat(hider_pos, self.n_seekers, axis=0)
+        pos2 = np.tile(seeker_pos, (self.n_hiders, 1))
+        hider_sees = self.sight.can_see_batch(hider_angles.ravel(), pos1, pos2).reshape(self.n_hiders, self.n_seekers)
+        seeker_sees = self.sight.can_see_batch(seeker_angles.T.ravel(), pos2, pos1).reshape(self.n_hiders, self.n_seekers).T
+
+        if self.check_gameover():
+            self.endgame('Seeker wins')
 
         for i in range(self.n_hiders):
-            angle = calc_angle_robots(self.seeker_pos[id], self.seeker_yaw[id], self.hider_pos[i])
-            
-            if can_see(angle, self.seeker_pos[id], self.hider_pos[i]):
-                distance = calc_distance(self.seeker_pos[id], self.hider_pos[i])
-
-                message += 'Angle: ' + str(angle) + '\nDistance: ' + str(distance) + '\n\n'
-                
-            else:
-                message += 'Angle: ' + str(math.inf) + '\nDistance: ' + str(math.inf) + '\n\n'
-            
-        self.publish_str_msg(self.seeker_pub[id], message)
-
-    def check_gameover(self):
+            self.hider_pub[i].publish(positions_message(hider_angles[i], distances[i], hider_sees[i]))
+
+        for i in range(self.n_seekers):
+            self.seeker_pub[i].publish(positions_message(seeker_angles[i], distances[:, i], seeker_sees[i]))
+
+        if CENTRAL_ASSIGNMENT and self.seeker_started:
+            self.assign(distances, seeker_sees)
+
+    def seeker_visibility(self):
+        # Which hiders each seeker sees, as (seekers, hiders)
+        seeker_angles = calc_angle_matrix(self.seeker_pos, self.seeker_yaw, self.hider_pos)
+
+        pos1 = np.repeat(self.hider_pos, self.n_seekers, axis=0)
+        pos2 = np.tile(self.seeker_pos, (self.n_hiders, 1))
+
+        return self.sight.can_see_batch(seeker_angles.T.ravel(), pos2, pos1).reshape(self.n_hiders, self.n_seekers).T
+
+    def assign(self, distances, seeker_sees):
+        # One assignment per seeker, instead of every seeker broadcasting its distances to all others.
+        # Seekers keep following their target between messages, so only changes are sent
+        targets = assign_targets(distances.T, seeker_sees)
+
+        for i in range(self.n_seekers):
+            if targets[i] != self.targets[i]:
+                self.targets[i] = targets[i]
+                self.seeker_pub[i].publish(game_msgs.assign(targets[i]))
+
+    def update_hider_distances(self, id):
+        self.hider_known[id] = True
+        row = np.square(self.seeker_pos - self.hider_pos[id]).sum(axis=1)
+        self.squared_distances[id] = np.where(self.seeker_known, row, math.inf)
+
+    def update_seeker_distances(self, id):
+        self.seeker_known[id] = True
+        column = np.square(self.hider_pos - self.seeker_pos[id]).sum(axis=1)
+        self.squared_distances[:, id] = np.where(self.hider_known, column, math.inf)
+
+    def update_all_distances(self):
+        squared = np.square(self.hider_pos[:, None, :] - self.seeker_pos[None, :, :]).sum(axis=2)
+        known = self.hider_known[:, None] & self.seeker_known[None, :]
+        self.squared_distances[:] = np.where(known, squared, math.inf)
+
+    def hiders_pos_callback(self, msg):
+        self.team_poses(msg, self.hider_pos, self.hider_yaw, self.hider_known)
+
+    def seekers_pos_callback(self, msg):
+        self.team_poses(msg, self.seeker_pos, self.seeker_yaw, self.seeker_known)
+
+        if self.tick_rate <= 0:
+            self.tick()
+
+    def team_poses(self, msg, pos, yaw, known):
+        n = min(len(msg.poses), len(pos))
+
+        values = np.array([[pose.position.x, pose.position.y, pose.position.z,
+                            pose.orientation.x, pose.orientation.y, pose.orientation.z, pose.orientation.w]
+                           for pose in msg.poses[:n]]).reshape(-1, 7)
+
+        pos[:n, 0] = values[:, 0] - self.origin[0]
+        pos[:n, 1] = values[:, 1] - self.origin[1]
+        pos[:n, 2] = values[:, 2]
+        x, y, z, w = values[:, 3], values[:, 4], values[:, 5], values[:, 6]
+        # Same as get_yaw for every pose
+        yaw[:n] = np.arctan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+        known[:n] = True
+
+        self.update_all_distances()
+
+    def check_gameover(self, hider=None, seeker=None):
+        # Only the row or column of the robot that moved, or the whole matrix when none is given
         if not(self.hider_started and self.seeker_started):
             return False
 
         if self.time < SECONDS_SEEKER_START:
             return False
 
-        gameover = False
+        if hider is not None:
+            seeker = int(np.argmin(self.squared_distances[hider]))
+
+        elif seeker is not None:
+            hider = int(np.argmin(self.squared_distances[:, seeker]))
 
-        for hider_pos in self.hider_pos:
-            found = False
+        else:
+            hider, seeker = np.unravel_index(np.argmin(self.squared_distances), self.squared_distances.shape)
 
-            for seeker_pos in self.seeker_pos:
-                distance = calc_distance(hider_pos, seeker_pos)
+        if self.squared_distances[hider, seeker] > DISTANCE_ENDGAME ** 2:
+            return False
 
-                if distance <= DISTANCE_ENDGAME:
-                    found = True
-                    break
-            
-            if found:
-                gameover = True
-                break
+        if self.caught is None:
+            self.caught = (int(hider), int(seeker))
+            self.get_logger().info('Hider ' + str(self.caught[0]) + ' caught by seeker ' + str(self.caught[1]))
 
-        return gameover
+        return True
 
     def endgame(self, msg='Game Over'):
+        message = game_msgs.signal(GAMEOVER_MSG)
+
         for pub in self.hider_pub:
-            self.publish_str_msg(pub,GAMEOVER_MSG)
+            pub.publish(message)
 
         for pub in self.seeker_pub:
-            self.publish_str_msg(pub,GAMEOVER_MSG)
+            pub.publish(message)
+
+def positions_message(angles, distances, visible):
+    # Robots out of sight, or whose pose is not known yet, are sent as inf
+    visible = np.asarray(visible) & np.isfinite(distances)
+    angles = np.where(visible, angles, math.inf)
+    distances = np.where(visible, distances, math.inf)
 
+    return game_msgs.positions(angles.tolist(), distances.tolist())
 
 def main(args=None):
     rclpy.init(args=args)
@@ -0,0 +1,127 @@
+'''
+Messages of the /<robot>/game and /seekers topics. With BINARY_GAME_MSGS they are
+Float64MultiArray with a fixed layout (inf is kept as is for robots not in sight):
+    POSITIONS:   [code, n, angle_0, distance_0, ..., angle_n-1, distance_n-1]
+    RESET:       [code, elapsed]
+    ASSIGN:      [code, hider followed by the seeker or -1]
+    START, GAMEOVER: [code]
+    /seekers:    [code, n, distance_0, ..., distance_n-1]
+Otherwise the original String messages are sent. The topic type follows the setting, so every
+node of a game must use the same BINARY_GAME_MSGS (a String and a Float64MultiArray endpoint
+never connect). decode() and decode_distances() accept either message.
+'''
+
+from array import array
+from collections import namedtuple
+
+from std_msgs.msg import String, Float64MultiArray
+
+from robot_hide_seek.utils import *
+
+MSG_CODES = {START_MSG: 0, GAMEOVER_MSG: 1, RESET_MSG: 2, POSITIONS_MSG_HEADER: 3, DISTANCES_MSG_HEADER: 4, ASSIGN_MSG: 5}
+MSG_HEADERS = {code: header for header, code in MSG_CODES.items()}
+
+MSG_TYPE = Float64MultiArray if BINARY_GAME_MSGS else String
+
+GameMessage = namedtuple('GameMessage', ['header', 'angles', 'distances', 'elapsed', 'target'])
+
+def pack(values):
+    msg = Float64MultiArray()
+    # Assigning an array skips the per element checks done for lists
+    msg.data = array('d', values)
+    return msg
+
+def text(data):
+    msg = String()
+    msg.data = data
+    return msg
+
+def signal(header):
+    if BINARY_GAME_MSGS:
+        return pack([MSG_CODES[header]])
+
+    return text(header)
+
+def reset(elapsed=0):
+    if BINARY_GAME_MSGS:
+        return pack([MSG_CODES[RESET_MSG], elapsed])
+
+    return text(RESET_MSG + '\n\n' + str(elapsed))
+
+def assign(target):
+    if BINARY_GAME_MSGS:
+        return pack([MSG_CODES[ASSIGN_MSG], target])
+
+    return text(ASSIGN_MSG + '\n\n' + str(target))
+
+def positions(angles, distances):
+    if BINARY_GAME_MSGS:
+        values = [MSG_CODES[POSITIONS_MSG_HEADER], len(angles)]
+
+        for angle, distance in zip(angles, distances):
+            values.append(angle)
+            values.append(distance)
+
+        return pack(values)
+
+    data = POSITIONS_MSG_HEADER + '\n\n'
+
+    for angle, distance in zip(angles, distances):
+        data += 'Angle: ' + str(angle) + '\nDistance: ' + str(distance) + '\n\n'
+
+    return text(data)
+
+def shared_distances(values):
+    if BINARY_GAME_MSGS:
+        return pack([MSG_CODES[DISTANCES_MSG_HEADER], len(values)] + list(values))
+
+    data = ''
+
+    for distance in values:
+        data += str(distance) + '\n'
+
+    return text(data)
+
+def decode(msg):
+    if isinstance(msg, String):
+        return decode_text(msg.data)
+
+    data = msg.data
+    header = MSG_HEADERS[int(data[0])]
+
+    if header == POSITIONS_MSG_HEADER:
+        n = int(data[1])
+        return GameMessage(header, list(data[2:2 + 2 * n:2]), list(data[3:3 + 2 * n:2]), 0, -1)
+
+    if header == RESET_MSG:
+        return GameMessage(header, [], [], int(data[1]) if len(data) > 1 else 0, -1)
+
+    if header == ASSIGN_MSG:
+        return GameMessage(header, [], [], 0, int(data[1]))
+
+    return GameMessage(header, [], [], 0, -1)
+
+def decode_text(data):
+    if data in (START_MSG, GAMEOVER_MSG):
+        return GameMessage(data, [], [], 0, -1)
+
+    message = data.rstrip().split('\n\n')
+
+    if message[0] == RESET_MSG:
+        return GameMessage(RESET_MSG, [], [], int(message[1]) if len(message) > 1 else 0, -1)
+
+    if message[0] == ASSIGN_MSG:
+        return GameMessage(ASSIGN_MSG, [], [], 0, int(message[1]))
+
+    if message[0] == POSITIONS_MSG_HEADER:
+        angles = [float(pos.split('\n')[0][7:]) for pos in message[1:]]
+        distances = [float(pos.split('\n')[1][10:]) for pos in message[1:]]
+        return GameMessage(POSITIONS_MSG_HEADER, angles, distances, 0, -1)
+
+    return GameMessage(message[0], [], [], 0, -1)
+
+def decode_distances(msg):
+    if isinstance(msg, String):
+        return [float(distance) for distance in msg.data.rstrip().split('\n')]
+
+    return list(msg.data[2:2 + int(msg.data[1])])
@@ -3,24 +3,136 @@ Adapted from https://bitbucket.org/theconstructcore/drone_training/src/master/
 '''
 
 import rclpy
+from rclpy.task import Future
+import time
+import threading
+from math import sin, cos
 
 from std_srvs.srv._empty import Empty_Request
 from std_srvs.srv import Empty
+from gazebo_msgs.srv import SetEntityState
+
+from robot_hide_seek.utils import *
+from robot_hide_seek.latency import LatencyRecorder
 
 class GazeboConnection():
-    
-    def __init__(self, node):
+
+    def __init__(self, node, namespace='', origin=None):
         self.node = node
-        
+
+        # Arenas tiled in the same world share physics, so they can only be reset one by one
+        self.namespace = namespace
+        self.origin = origin if origin is not None else [0.0, 0.0]
+
         self.pause = self.node.create_client(Empty, '/pause_physics')
         self.unpause = self.node.create_client(Empty, '/unpause_physics')
         self.reset_proxy = self.node.create_client(Empty, '/reset_simulation')
-    
+        self.set_state = self.node.create_client(SetEntityState, '/gazebo/set_entity_state')
+
+        self.ready = False
+        # Service found missing by waitForServices, calls fail right away instead of waiting again
+        self.missing = None
+        self.latency = LatencyRecorder()
+
+    def waitForServices(self, timeout=SERVICE_TIMEOUT):
+        # Requests sent before a service is available are silently dropped
+        for client in self.clients():
+            if not client.wait_for_service(timeout_sec=timeout):
+                self.node.get_logger().warn('Service ' + client.srv_name + ' not available')
+                self.missing = client.srv_name
+                return False
+
+        self.ready = True
+        return True
+
+    def clients(self):
+        # Only the services the reset mode uses, arenas and fast resets move the robots instead
+        if self.namespace:
+            return [self.set_state]
+
+        return [self.pause, self.unpause, self.set_state if FAST_RESET else self.reset_proxy]
+
+    def call(self, client, request, name):
+        if not self.ready and self.missing is None:
+            self.waitForServices()
+
+        if self.missing is not None:
+            raise RuntimeError('Gazebo service ' + self.missing + ' not available')
+
+        start = time.time()
+        future = client.call_async(request)
+        future.add_done_callback(lambda future: self.latency.record(name, time.time() - start))
+
+        return future
+
+    def done(self):
+        future = Future()
+        future.set_result(None)
+
+        return future
+
+    def wait(self, future, timeout=SERVICE_TIMEOUT):
+        if future.done():
+            return True
+
+        # Futures are completed by the executor spinning the node, in another thread
+        event = threading.Event()
+        future.add_done_callback(lambda future: event.set())
+
+        if not event.wait(timeout):
+            self.node.get_logger().warn('Gazebo service call timed out')
+            return False
+
+        return True
+
+    def waitFor(self, futures, timeout):
+        deadline = time.time() + timeout
+
+        for future in futures:
+            if not self.wait(future, max(0, deadline - time.time())):
+                return False
+
+        return True
+
     def pauseSim(self):
-        self.pause.call_async(Empty_Request())
-        
+        if self.namespace:
+            return self.done()
+
+        return self.call(self.pause, Empty_Request(), 'pause')
+
     def unpauseSim(self):
-        self.unpause.call_async(Empty_Request())
-        
+        if self.namespace:
+            return self.done()
+
+        return self.call(self.unpause, Empty_Request(), 'unpause')
+
     def resetSim(self):
-        self.reset_proxy.call_async(Empty_Request())
\ No newline at end of file
+        if self.namespace:
+            self.resetRobots()
+            return self.done()
+
+        return self.call(self.reset_proxy, Empty_Request(), 'reset')
+
+    def resetRobots(self, poses=None):
+        # Moves only the robots (poses relative to the arena origin), the world and its clock keep going
+        if poses is None:
+            poses = START_POSES
+
+        futures = [self.setRobotPose(robot, pose[0] + self.origin[0], pose[1] + self.origin[1], pose[2])
+                   for robot, pose in poses.items()]
+
+        return self.waitFor(futures, RESET_TIMEOUT)
+
+    def setRobotPose(self, robot, x, y, yaw):
+        request = SetEntityState.Request()
+        request.state.name = entity_name(self.namespace, robot)
+        request.state.pose.position.x = float(x)
+        request.state.pose.position.y = float(y)
+        request.state.pose.orientation.z = sin(yaw / 2)
+        request.state.pose.orientation.w = cos(yaw / 2)
+        # Robots must not keep the velocity they had when the episode ended
+        request.state.twist.linear.x = 0.0
+        request.state.twist.angular.z = 0.0
+        request.state.reference_frame = 'world'
+
+        return self.call(self.set_state, request, 'set_entity_state')
@@ -1,47 +1,74 @@
-from math import radians, degrees, isinf, pi, inf
+from math import isinf, pi, inf
+import threading
+import time
 
 import rclpy
 from rclpy.node import Node
 from rclpy.qos import qos_profile_sensor_data
+from rclpy.callback_groups import MutuallyExclusiveCallbackGroup
 
-from std_msgs.msg import String
+from std_msgs.msg import Float64
 from rosgraph_msgs.msg import Clock
 from sensor_msgs.msg import LaserScan
 from geometry_msgs.msg import Twist
 
 from robot_hide_seek.utils import *
+from robot_hide_seek import intra, game_msgs, scan
 from robot_hide_seek import deepqlearn
+from robot_hide_seek.inference import InferenceWorker
+from robot_hide_seek.policy_server import PolicyClient, policy_socket
+from robot_hide_seek.model_watcher import ModelWatcher
+from robot_hide_seek.policy_cache import PolicyCache
+from robot_hide_seek.latency import LatencyRecorder
 
 class Hider(Node):
     follow_id = inf
     follow_distance = inf
     follow_angle = inf
+    clock = -1
+    start_time = 0
     time = -1
     gameover = True
     
-    def __init__(self, id=None):
+    def __init__(self, id=None, namespace='', bus=None, deepQ=None):
         if id==None:
             super().__init__('hider')
             self.declare_parameter('id')
             id = self.get_parameter('id').value
+            self.declare_parameter('namespace', '')
+            namespace = self.get_parameter('namespace').value
 
         else:
-            super().__init__('hider_' + str(id))
-
-        self.node_topic = '/hider_' + str(id)
-
-        self.game_sub = self.create_subscription(
-            String,
+            super().__init__('hider_' + str(id), namespace=namespace or None)
+
+        self.namespace = namespace
+        self.node_topic = namespace + '/hider_' + str(id)
+
+        # Game state callbacks never run concurrently with each other, scans have their own group
+        # so a slow policy does not hold back /clock and game messages
+        self.game_group = MutuallyExclusiveCallbackGroup()
+        self.scan_group = MutuallyExclusiveCallbackGroup()
+        self.vel_lock = threading.Lock()
+
+        # Game-level channels go through bus when the whole game runs in this process
+        self.game_sub = intra.create_subscription(
+            self,
+            bus,
+            game_msgs.MSG_TYPE,
             self.node_topic + '/game',
             self.game_callback,
-            10
+            10,
+            callback_group=self.game_group
         )
 
-        self.clock_sub = self.create_subscription(
+        self.clock_sub = intra.create_subscription(
+            self,
+            bus,
             Clock, 
             '/clock', 
             self.clock_callback,
-            10
+            10,
+            callback_group=self.game_group
         )
         self.vel_pub = self.create_publisher(
             Twist,
@@ -52,12 +79,40 @@ class Hider(Node):
             LaserScan, 
             self.node_topic + '/scan', 
             self.lidar_callback,
-            qos_profile_sensor_data
+            qos_profile_sensor_data,
+            callback_group=self.scan_group
         )
 
+        # deepQ: policy shared by the team when the whole game runs in one process
         if GAME_USES_TRAINING:
-            self.deepQ = deepqlearn.DeepQ(11, 5, save_path='./training_results/hider')
-            self.deepQ.initPlay()
+            self.deepQ = deepQ
+
+            if self.deepQ is None and USE_POLICY_SERVER:
+                self.deepQ = PolicyClient(policy_socket('hider'))
+
+            elif self.deepQ is None:
+                self.deepQ = deepqlearn.DeepQ(OBSERVATION_SIZE, 5, save_path='./training_results/hider')
+                self.deepQ.initPlay()
+
+        # Time from receiving a scan to publishing the command computed from it, in seconds
+        self.latency = LatencyRecorder()
+        self.latency_pub = self.create_publisher(
+            Float64,
+            self.node_topic + '/latency',
+            10
+        )
+
+        self.inference = None
+        if GAME_USES_TRAINING and INFERENCE_WORKER:
+            self.inference = InferenceWorker(self.predict, self.act, self.get_name() + '_inference', self.get_logger())
+
+        # Repeated observations skip the network
+        self.cache = PolicyCache() if USE_POLICY_CACHE else None
+
+        # A model loaded by this node follows new checkpoints, shared ones are watched by their owner
+        self.watcher = None
+        if GAME_USES_TRAINING and WATCH_MODEL and deepQ is None and not USE_POLICY_SERVER:
+            self.watcher = ModelWatcher('./training_results/hider', self.swap_model, logger=self.get_logger())
 
     def reset(self):
         self.follow_id = inf
@@ -65,24 +120,37 @@ class Hider(Node):
         self.follow_angle = inf
 
     def clock_callback(self, msg):
-        if int(msg.clock.sec) < self.time:
+        if int(msg.clock.sec) < self.clock:
+            self.start_time = 0
             self.gameover = False
             self.reset()
 
-        self.time = int(msg.clock.sec)
+        self.clock = int(msg.clock.sec)
+        self.time = self.clock - self.start_time
+
+    def restart(self, elapsed=0):
+        self.start_time = self.clock - elapsed
+        self.time = elapsed
+        self.gameover = False
+        self.reset()
 
     def game_callback(self, msg):
-        if msg.data == START_MSG:
+        message = game_msgs.decode(msg)
+
+        if message.header == START_MSG:
             return
 
-        if msg.data == GAMEOVER_MSG:
+        if message.header == GAMEOVER_MSG:
             self.endgame()
+            return
 
-        message = msg.data.rstrip().split('\n\n')
+        if message.header == RESET_MSG:
+            self.restart(message.elapsed)
+            return
 
-        if message[0] == POSITIONS_MSG_HEADER:
-            angles = [float(pos.split('\n')[0][7:]) for pos in message[1:]]
-            distances = [float(pos.split('\n')[1][10:]) for pos in message[1:]]
+        if message.header == POSITIONS_MSG_HEADER:
+            angles = message.angles
+            distances = message.distances
 
             closest = (inf, inf)
 
@@ -96,48 +164,28 @@ class Hider(Node):
                 self.follow_distance = closest[1]
 
     def lidar_callback(self, msg):
+        received = time.perf_counter()
+
         if self.time < SECONDS_HIDER_START or self.gameover:
             return
 
         if GAME_USES_TRAINING:
-            observation = [msg.ranges[0], msg.ranges[45], msg.ranges[90], msg.ranges[135], msg.ranges[180], msg.ranges[225], msg.ranges[270], msg.ranges[315]]
+            observation = scan.lidar_features(msg).tolist()
 
             observation.append(self.follow_angle)
             observation.append(self.follow_distance)
             observation.append(self.time)
 
-            action = self.deepQ.predict(observation)
-            vel = Twist()
-
-            if action == 0: #Forward
-                vel.linear.x = HIDER_LINEAR_SPEED
-                vel.angular.z = 0.0
-            elif action == 1: #Rotate left
-                vel.linear.x = 0.0
-                vel.angular.z = ROBOT_ANGULAR_SPEED
-            elif action == 2: #Rotate right
-                vel.linear.x = 0.0
-                vel.angular.z = -ROBOT_ANGULAR_SPEED
-            elif action == 3: #Stop
-                vel.linear.x = 0.0
-                vel.angular.z = 0.0
-            elif action == 4: #Back
-                vel.linear.x = -HIDER_LINEAR_SPEED
-                vel.angular.z = 0.0
-            
-            self.vel_pub.publish(vel)
+            if self.inference is not None:
+                self.inference.submit(observation, received)
+            else:
+                self.act(self.predict(observation), received)
 
             return
 
-        min_range = msg.ranges[0]
-        min_angle = msg.angle_min
-
-        for i in range(1, len(msg.ranges)):
-            angle = degrees(msg.angle_min + (i* msg.angle_increment))
-
-            if msg.ranges[i] < min_range:
-                min_range = msg.ranges[i]
-                min_angle = radians(angle)
+        closest = scan.process(msg)
+        min_range = closest.min_range
+        min_angle = closest.min_angle
 
         if isinf(min_range):
             return
@@ -182,19 +230,83 @@ class Hider(Node):
         
         vel.angular.z = min_angle * TURN_RATIO
 
-        self.vel_pub.publish(vel)
+        with self.vel_lock:
+            if not self.gameover:
+                self.vel_pub.publish(vel)
+
+    def predict(self, observation):
+        # self.deepQ is read once per scan, so a swap takes effect on the next one
+        deepQ = self.deepQ
+
+        if self.cache is not None:
+            return self.cache.predict(deepQ, observation)
+
+        return deepQ.predict(observation)
+
+    def swap_model(self, deepQ):
+        self.deepQ = deepQ
+
+        # Actions of the old model
+        if self.cache is not None:
+            self.cache.clear()
+
+    def act(self, action, received):
+        vel = Twist()
+
+        if action == 0: #Forward
+            vel.linear.x = HIDER_LINEAR_SPEED
+            vel.angular.z = 0.0
+        elif action == 1: #Rotate left
+            vel.linear.x = 0.0
+            vel.angular.z = ROBOT_ANGULAR_SPEED
+        elif action == 2: #Rotate right
+            vel.linear.x = 0.0
+            vel.angular.z = -ROBOT_ANGULAR_SPEED
+        elif action == 3: #Stop
+            vel.linear.x = 0.0
+            vel.angular.z = 0.0
+        elif action == 4: #Back
+            vel.linear.x = -HIDER_LINEAR_SPEED
+            vel.angular.z = 0.0
+
+        # A game over handled while the policy ran already stopped the robot
+        with self.vel_lock:
+            if self.gameover:
+                return
+
+            self.vel_pub.publish(vel)
+
+        latency = time.perf_counter() - received
+        self.latency.record('scan_to_cmd_vel', latency)
+        msg = Float64()
+        msg.data = latency
+        self.latency_pub.publish(msg)
 
     def endgame(self):  
-        self.gameover = True      
-        self.vel_pub.publish(Twist())
+        if self.inference is not None:
+            self.inference.clear()
+
+        with self.vel_lock:
+            self.gameover = True
+            self.vel_pub.publish(Twist())
+
+        if self.cache is not None:
+            self.get_logger().info('Policy cache hit rate ' + '%.1f' % (100 * self.cache.hit_rate()) + '% (' +
+                                   str(len(self.cache.entries)) + ' entries, max error ' + str(self.cache.max_error()[0]) + ')')
 
 def main(args=None):
     rclpy.init(args=args)
 
     hider = Hider()
 
-    rclpy.spin(hider)
+    executor = rclpy.executors.MultiThreadedExecutor()
+    executor.add_node(hider)
+    executor.spin()
 
+    if hider.inference is not None:
+        hider.inference.stop()
+    if hider.watcher is not None:
+        hider.watcher.stop()
     hider.destroy_node()
     rclpy.shutdown()
 
@@ -15,8 +15,9 @@ import time
 import threading
 import math
 
-from robot_hide_seek import hider_train, gazebo_connection, seeker, game_controller
+from robot_hide_seek import hider_train, gazebo_connection, seeker, game_controller, intra
 from robot_hide_seek.utils import *
+from robot_hide_seek.latency import StepProfiler, NullProfiler
 
 reg = register(
     id='hiderEnv-v0',
@@ -24,13 +25,21 @@ reg = register(
 )
 
 class HiderEnv(gym.Env):
-    def __init__(self):
-        rclpy.init()
+    def __init__(self, namespace='', origin=None):
+        # Several arena environments may share the same process
+        if not rclpy.ok():
+            rclpy.init()
         self.executor = rclpy.executors.MultiThreadedExecutor(5)
 
-        self.hiders = [hider_train.HiderTrain(0), hider_train.HiderTrain(1)]
-        self.seekers = [seeker.Seeker(0), seeker.Seeker(1)]
-        self.game_controller = game_controller.HideSeek()
+        self.namespace = namespace
+        self.origin = origin if origin is not None else [0.0, 0.0]
+
+        # Game messages and the clock are passed in-process, only Gazebo topics go through DDS
+        self.bus = intra.IntraProcessBus() if INTRA_PROCESS else None
+
+        self.hiders = [hider_train.HiderTrain(0, namespace, self.bus), hider_train.HiderTrain(1, namespace, self.bus)]
+        self.seekers = [seeker.Seeker(0, namespace, self.bus), seeker.Seeker(1, namespace, self.bus)]
+        self.game_controller = game_controller.HideSeek(namespace, self.origin, self.bus)
 
         for hider_node in self.hiders:
             self.executor.add_node(hider_node)
@@ -41,12 +50,14 @@ class HiderEnv(gym.Env):
         self.executor_thread = threading.Thread(target=self.run_executor, daemon=True)
         self.executor_thread.start()
 
-        self.gazebo = gazebo_connection.GazeboConnection(self.game_controller)
+        self.gazebo = gazebo_connection.GazeboConnection(self.game_controller, namespace, self.origin)
         self.action_space = spaces.Discrete(5)
         self.reward_range = (-math.inf, math.inf)
 
         self.current_hider = 0
 
+        self.profiler = StepProfiler('hiders_profile.txt') if PROFILE_STEPS else NullProfiler()
+
         self._seed()
 
     def _seed(self, seed = None):
@@ -56,23 +67,39 @@ class HiderEnv(gym.Env):
     def reset(self):
         self.current_hider = 0
 
-        for hider_node in self.hiders:
-            hider_node.result = 0
-            hider_node.time = 0
-            hider_node.reset()
-        for seeker_node in self.seekers:
-            seeker_node.gameover = False
-            seeker_node.time = 0
-            seeker_node.reset()
-        self.game_controller.time = 0
-        self.game_controller.reset()
+        with self.profiler.phase('reset'):
+            if FAST_RESET or self.namespace:
+                self.stop_robots()
+                # Only the robots are moved, the clock keeps running and game timing restarts explicitly
+                self.gazebo.resetRobots(self.start_poses())
 
-        self.gazebo.resetSim()
-        self.gazebo.unpauseSim()
+                for node in self.hiders + self.seekers:
+                    node.restart()
+                self.game_controller.restart(notify=False)
 
-        while True:
-            if self.game_controller.time >= SECONDS_HIDER_START:
-                break
+            else:
+                for hider_node in self.hiders:
+                    hider_node.result = 0
+                    hider_node.time = 0
+                    hider_node.reset()
+                for seeker_node in self.seekers:
+                    seeker_node.gameover = False
+                    seeker_node.time = 0
+                    seeker_node.reset()
+                self.game_controller.time = 0
+                self.game_controller.reset()
+
+                self.gazebo.wait(self.gazebo.resetSim())
+
+        with self.profiler.phase('head_start'):
+            self.gazebo.wait(self.gazebo.unpauseSim())
+
+            while True:
+                if self.game_controller.time >= SECONDS_HIDER_START:
+                    break
+
+        # Observations are read once the world is actually paused
+        self.gazebo.wait(self.gazebo.pauseSim())
 
         observations = []
         observations.append(self.take_observation())
@@ -80,13 +107,61 @@ class HiderEnv(gym.Env):
         observations.append(self.take_observation())
         self.current_hider = (self.current_hider + 1) % len(self.hiders)
 
-        self.gazebo.pauseSim()
-
         return observations
 
     def step(self, action):
         hider = self.hiders[self.current_hider]
 
+        repeat = action_repeat([action], [hider.snapshot.lidar])
+
+        with self.profiler.phase('unpause'):
+            unpause = self.gazebo.unpauseSim()
+            vel = self.action_to_vel(action)
+            self.gazebo.wait(unpause)
+
+        with self.profiler.phase('publish'):
+            try:
+                hider.vel_pub
+            except AttributeError:
+                pass
+            else:
+                hider.vel_pub.publish(vel)
+
+            action_time = hider.sim_time
+            last_seq = hider.snapshot.seq
+
+        # The action is held for repeat periods with the simulation running, the reward of period k
+        # is discounted by DISCOUNT_FACTOR ** k (the learner discounts the next state by
+        # DISCOUNT_FACTOR ** repeat) and periods after the end of the game are not played.
+        # Scans are slower than a period, so each snapshot's reward is only added once
+        reward = 0
+        period = RUNNING_STEP / len(self.hiders)
+
+        for i in range(repeat):
+            # Instead of sleeping, wait for the first new observation covering the whole period
+            with self.profiler.phase('wait_observation'):
+                snapshot = hider.wait_for_snapshot(action_time + (i + 1) * period, last_seq)
+
+            observation = self.take_observation(snapshot=snapshot)
+            period_reward, done = self.process_observation(observation)
+
+            if snapshot.seq > last_seq:
+                reward += DISCOUNT_FACTOR ** i * period_reward
+                last_seq = snapshot.seq
+
+            if done:
+                break
+
+        with self.profiler.phase('pause'):
+            self.gazebo.wait(self.gazebo.pauseSim())
+
+        self.profiler.step(self.game_controller.sim_time)
+
+        self.current_hider = (self.current_hider + 1) % len(self.hiders)
+
+        return observation, reward, done, {'repeat': i + 1}
+
+    def action_to_vel(self, action):
         vel = Twist()
 
         if action == 0: #Forward
@@ -105,29 +180,71 @@ class HiderEnv(gym.Env):
             vel.linear.x = -HIDER_LINEAR_SPEED
             vel.angular.z = 0.0
 
-        self.gazebo.unpauseSim()
+        return vel
 
-        try:
-            hider.vel_pub
-        except AttributeError:
-            pass
-        else:
-            hider.vel_pub.publish(vel)
+    def step_all(self, actions):
+        # One action per team member, applied together and advanced by RUNNING_STEP per repeat
+        repeat = action_repeat(actions, [hider.snapshot.lidar for hider in self.hiders])
 
-        time.sleep(RUNNING_STEP / len(self.hiders))
-        observation = self.take_observation()
-        self.gazebo.pauseSim()
+        with self.profiler.phase('unpause'):
+            unpause = self.gazebo.unpauseSim()
+            vels = [self.action_to_vel(action) for action in actions]
+            self.gazebo.wait(unpause)
 
-        reward, done = self.process_observation(observation)
+        with self.profiler.phase('publish'):
+            for hider, vel in zip(self.hiders, vels):
+                hider.vel_pub.publish(vel)
 
-        self.current_hider = (self.current_hider + 1) % len(self.hiders)
+            action_time = self.game_controller.sim_time
+            last_seqs = [hider.snapshot.seq for hider in self.hiders]
+
+        rewards = [0 for hider in self.hiders]
+
+        for i in range(repeat):
+            with self.profiler.phase('wait_observation'):
+                snapshots = [hider.wait_for_snapshot(action_time + (i + 1) * RUNNING_STEP, last_seqs[j]) for j, hider in enumerate(self.hiders)]
+
+            observations = [self.take_observation(snapshot=snapshot) for snapshot in snapshots]
+            dones = []
+
+            for j, observation in enumerate(observations):
+                reward, done = self.process_observation(observation)
+                dones.append(done)
+
+                # A snapshot seen in an earlier period (wait timed out) is not counted again
+                if snapshots[j].seq > last_seqs[j]:
+                    rewards[j] += DISCOUNT_FACTOR ** i * reward
+                    last_seqs[j] = snapshots[j].seq
+
+            # The game ends for the whole team at once
+            if any(dones):
+                break
+
+        with self.profiler.phase('pause'):
+            self.gazebo.wait(self.gazebo.pauseSim())
+
+        self.profiler.step(self.game_controller.sim_time)
+
+        return observations, rewards, dones, {'repeat': i + 1}
+
+    def stop_robots(self):
+        for node in self.hiders + self.seekers:
+            node.vel_pub.publish(Twist())
+
+    def start_poses(self):
+        if RANDOM_START_POSES:
+            return sample_start_poses(self.np_random)
+
+        return START_POSES
 
-        return observation, reward, done, {}
+    def take_observation(self, hider_id=None, snapshot=None):
+        if snapshot is None:
+            if hider_id is None:
+                hider_id = self.current_hider
 
-    def take_observation(self):
-        sensors = self.hiders[self.current_hider].lidar_sensors[:]        
+            snapshot = self.hiders[hider_id].snapshot
 
-        return [sensors, self.hiders[self.current_hider].follow_angle, self.hiders[self.current_hider].follow_distance, self.hiders[self.current_hider].time, self.hiders[self.current_hider].result]
+        return [snapshot.lidar[:], snapshot.follow_angle, snapshot.follow_distance, snapshot.time, snapshot.result]
 
     def process_observation(self, observation):
         reward = 0
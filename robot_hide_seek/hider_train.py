@@ -1,37 +1,52 @@
 from math import radians, degrees, isinf, pi, inf
+import threading
 
 import rclpy
 from rclpy.node import Node
 from rclpy.qos import qos_profile_sensor_data
 
-from std_msgs.msg import String
 from rosgraph_msgs.msg import Clock
 from sensor_msgs.msg import LaserScan
 from geometry_msgs.msg import Twist
 
 from robot_hide_seek.utils import *
+from robot_hide_seek import intra, game_msgs, scan
 
 class HiderTrain(Node):
     follow_id = inf
     follow_distance = inf
     follow_angle = inf
+    clock = -1
+    sim_time = 0.0
+    start_time = 0
     time = -1
     lidar_sensors = []
     result = 0
+    snapshot = None
+    snapshot_timeouts = 0
     
-    def __init__(self, id):
-        super().__init__('hider_' + str(id))
+    def __init__(self, id, namespace='', bus=None):
+        super().__init__('hider_' + str(id), namespace=namespace or None)
 
-        self.node_topic = '/hider_' + str(id)
+        self.namespace = namespace
+        self.node_topic = namespace + '/hider_' + str(id)
 
-        self.game_sub = self.create_subscription(
-            String,
+        self.snapshot_condition = threading.Condition()
+        self.take_snapshot(0.0)
+
+        # Game-level channels go through bus when the whole game runs in this process
+        self.game_sub = intra.create_subscription(
+            self,
+            bus,
+            game_msgs.MSG_TYPE,
             self.node_topic + '/game',
             self.game_callback,
             10
         )
 
-        self.clock_sub = self.create_subscription(
+        self.clock_sub = intra.create_subscription(
+            self,
+            bus,
             Clock, 
             '/clock', 
             self.clock_callback,
@@ -56,24 +71,39 @@ class HiderTrain(Node):
         self.lidar_sensors = []
 
     def clock_callback(self, msg):
-        if int(msg.clock.sec) < self.time:
+        if int(msg.clock.sec) < self.clock:
+            self.start_time = 0
             self.result = 0
             self.reset()
 
-        self.time = int(msg.clock.sec)
+        self.clock = int(msg.clock.sec)
+        self.sim_time = msg.clock.sec + msg.clock.nanosec * 1e-9
+        self.time = self.clock - self.start_time
+
+    def restart(self, elapsed=0):
+        self.start_time = self.clock - elapsed
+        self.time = elapsed
+        self.result = 0
+        self.reset()
+        self.take_snapshot(self.sim_time)
 
     def game_callback(self, msg):
-        if msg.data == START_MSG:
+        message = game_msgs.decode(msg)
+
+        if message.header == START_MSG:
             return
 
-        elif msg.data == GAMEOVER_MSG:
+        if message.header == GAMEOVER_MSG:
             self.endgame()
+            return
 
-        message = msg.data.rstrip().split('\n\n')
+        if message.header == RESET_MSG:
+            self.restart(message.elapsed)
+            return
 
-        if message[0] == POSITIONS_MSG_HEADER:
-            angles = [float(pos.split('\n')[0][7:]) for pos in message[1:]]
-            distances = [float(pos.split('\n')[1][10:]) for pos in message[1:]]
+        if message.header == POSITIONS_MSG_HEADER:
+            angles = message.angles
+            distances = message.distances
 
             closest = (inf, inf)
 
@@ -87,7 +117,29 @@ class HiderTrain(Node):
                 self.follow_distance = closest[1]
 
     def lidar_callback(self, msg):
-        self.lidar_sensors = [msg.ranges[0], msg.ranges[45], msg.ranges[90], msg.ranges[135], msg.ranges[180], msg.ranges[225], msg.ranges[270], msg.ranges[315]]
+        self.lidar_sensors = scan.lidar_features(msg).tolist()
+        self.take_snapshot(msg.header.stamp.sec + msg.header.stamp.nanosec * 1e-9)
+
+    def take_snapshot(self, stamp):
+        # Built in this node's callbacks, which never run concurrently, so fields are consistent
+        with self.snapshot_condition:
+            seq = self.snapshot.seq + 1 if self.snapshot is not None else 0
+            self.snapshot = Snapshot(seq, stamp, self.lidar_sensors[:], self.follow_angle, self.follow_distance, self.time, self.result)
+            self.snapshot_condition.notify_all()
+
+    def wait_for_snapshot(self, stamp, after=-1, timeout=SNAPSHOT_TIMEOUT):
+        # First snapshot newer than seq after taken at or after stamp (sim time), or one with the game result.
+        # On timeout the latest one is returned, callers can tell it is old by its seq
+        with self.snapshot_condition:
+            fresh = self.snapshot_condition.wait_for(lambda: (self.snapshot.seq > after and self.snapshot.stamp >= stamp) or self.snapshot.result != 0, timeout)
+            snapshot = self.snapshot
+
+        if not fresh:
+            self.snapshot_timeouts += 1
+            self.get_logger().warn('No snapshot after ' + '%.2f' % stamp + 's within ' + str(timeout) +
+                                   's, latest is ' + str(snapshot.seq) + ' at ' + '%.2f' % snapshot.stamp + 's')
+
+        return snapshot
 
     def endgame(self):
         if self.time < SECONDS_SEEKER_START:
@@ -99,4 +151,5 @@ class HiderTrain(Node):
         else:
             self.result = 1
 
-        self.reset()
\ No newline at end of file
+        self.reset()
+        self.take_snapshot(self.sim_time)
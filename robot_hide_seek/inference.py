@@ -0,0 +1,80 @@
+'''
+Inference worker for the game nodes. Scans are handed over with submit() and a single thread
+evaluates the policy on the latest one only: a scan arriving while the network runs replaces
+the pending one (counted in dropped), so actions are never computed from stale scans and the
+executor threads stay free for the clock and game callbacks.
+A scan whose evaluation fails is logged (counted in failures) and the robot is stopped, the
+worker goes on with the next scan.
+'''
+
+import threading
+import time
+
+STOP_ACTION = 3
+
+class InferenceWorker:
+
+    def __init__(self, predict, act, name='inference', logger=None):
+        self.predict = predict
+        self.act = act
+        self.logger = logger
+
+        self.pending = None
+        self.condition = threading.Condition()
+        self.running = True
+        self.submitted = 0
+        self.dropped = 0
+        self.failures = 0
+
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, observation, stamp=None):
+        # stamp: perf_counter time the scan was received, passed on to act()
+        with self.condition:
+            if self.pending is not None:
+                self.dropped += 1
+
+            self.pending = (observation, time.perf_counter() if stamp is None else stamp)
+            self.submitted += 1
+            self.condition.notify()
+
+    def log(self, message):
+        if self.logger is not None:
+            self.logger.error(message)
+        else:
+            print(message)
+
+    def clear(self):
+        with self.condition:
+            self.pending = None
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and self.pending is None:
+                    self.condition.wait()
+
+                if not self.running:
+                    return
+
+                observation, stamp = self.pending
+                self.pending = None
+
+            try:
+                self.act(self.predict(observation), stamp)
+            except Exception as error:
+                self.failures += 1
+                self.log('Inference failed, stopping the robot: ' + repr(error))
+
+                try:
+                    self.act(STOP_ACTION, stamp)
+                except Exception as error:
+                    self.log('Could not stop the robot: ' + repr(error))
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+        self.thread.join()
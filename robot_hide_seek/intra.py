@@ -0,0 +1,71 @@
+'''
+Intra-process transport for the game-level channels (/<robot>/game, /seekers, /clock fan-out)
+when every node lives in the same process, as in the training environments.
+Messages are handed over by reference: each subscription has a bounded queue and a guard
+condition, so callbacks still run in the subscribing node's executor, never concurrently
+with its other callbacks. Gazebo-facing topics (scan, odom, cmd_vel) stay on ROS.
+'''
+
+import threading
+from collections import deque
+
+class IntraProcessPublisher:
+
+    def __init__(self, bus, topic):
+        self.bus = bus
+        self.topic = topic
+
+    def publish(self, msg):
+        self.bus.dispatch(self.topic, msg)
+
+class IntraProcessSubscription:
+
+    def __init__(self, node, callback, depth, callback_group=None):
+        self.callback = callback
+        self.queue = deque(maxlen=depth)
+        self.guard_condition = node.create_guard_condition(self.drain, callback_group)
+
+    def push(self, msg):
+        self.queue.append(msg)
+        self.guard_condition.trigger()
+
+    def drain(self):
+        while self.queue:
+            self.callback(self.queue.popleft())
+
+class IntraProcessBus:
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    def create_publisher(self, topic):
+        return IntraProcessPublisher(self, topic)
+
+    def create_subscription(self, node, topic, callback, depth, callback_group=None):
+        subscription = IntraProcessSubscription(node, callback, depth, callback_group)
+
+        with self.lock:
+            self.subscriptions.setdefault(topic, []).append(subscription)
+
+        return subscription
+
+    def dispatch(self, topic, msg):
+        # Subscribers must treat messages as read-only, they are shared
+        for subscription in self.subscriptions.get(topic, ()):
+            subscription.push(msg)
+
+def qos_depth(qos):
+    return qos if isinstance(qos, int) else qos.depth
+
+def create_publisher(node, bus, msg_type, topic, qos):
+    if bus is None:
+        return node.create_publisher(msg_type, topic, qos)
+
+    return bus.create_publisher(topic)
+
+def create_subscription(node, bus, msg_type, topic, callback, qos, callback_group=None):
+    if bus is None:
+        return node.create_subscription(msg_type, topic, callback, qos, callback_group=callback_group)
+
+    return bus.create_subscription(node, topic, callback, qos_depth(qos), callback_group)
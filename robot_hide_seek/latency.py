@@ -0,0 +1,143 @@
+'''
+Latency histograms (over the last LATENCY_SAMPLES measurements) for named operations.
+'''
+
+import threading
+import time
+import contextlib
+from collections import deque
+
+from robot_hide_seek.utils import *
+
+def percentile(sorted_samples, p):
+    if not sorted_samples:
+        return 0.0
+
+    index = min(len(sorted_samples) - 1, int(round(p / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+class LatencyRecorder:
+
+    def __init__(self, size=LATENCY_SAMPLES):
+        self.size = size
+        self.samples = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self.lock:
+            if name not in self.samples:
+                self.samples[name] = deque(maxlen=self.size)
+                self.counts[name] = 0
+
+            self.samples[name].append(seconds)
+            self.counts[name] += 1
+
+    def summary(self):
+        with self.lock:
+            samples = {name: sorted(values) for name, values in self.samples.items()}
+            counts = dict(self.counts)
+
+        res = {}
+
+        for name, values in samples.items():
+            res[name] = {
+                'count': counts[name],
+                'mean': sum(values) / len(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'p99': percentile(values, 99),
+                'max': values[-1],
+            }
+
+        return res
+
+    def format_summary(self):
+        lines = []
+
+        for name, stats in self.summary().items():
+            lines.append(name + ': n=' + str(stats['count']) +
+                         ' mean=' + '%.2f' % (stats['mean'] * 1000) +
+                         'ms p50=' + '%.2f' % (stats['p50'] * 1000) +
+                         'ms p95=' + '%.2f' % (stats['p95'] * 1000) +
+                         'ms p99=' + '%.2f' % (stats['p99'] * 1000) + 'ms')
+
+        return '\n'.join(lines)
+
+class Phase:
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        self.profiler.recorder.record(self.name, time.perf_counter() - self.start)
+
+class StepProfiler:
+    """
+    Per-phase timings of the environment steps and the training loop.
+    Every PROFILE_DUMP_PERIOD seconds a summary (phase percentiles, steps per second
+    and simulated time per wall-clock second) is appended to path.
+    """
+    def __init__(self, path, period=PROFILE_DUMP_PERIOD):
+        self.path = path
+        self.period = period
+        self.recorder = LatencyRecorder()
+
+        self.steps = 0
+        self.window_steps = 0
+        self.window_wall = time.time()
+        self.window_sim = None
+
+    def phase(self, name):
+        return Phase(self, name)
+
+    def step(self, sim_time):
+        self.steps += 1
+        self.window_steps += 1
+
+        if self.window_sim is None:
+            self.window_sim = sim_time
+
+        now = time.time()
+
+        if now - self.window_wall >= self.period:
+            self.dump(now, sim_time)
+
+    def dump(self, now, sim_time):
+        wall = now - self.window_wall
+        sim = sim_time - self.window_sim
+
+        # A full simulation reset rewinds the clock
+        ratio = '%.2f' % (sim / wall) if sim >= 0 else 'n/a'
+
+        lines = ['[' + time.strftime('%Y-%m-%d %H:%M:%S') + '] steps=' + str(self.steps) +
+                 ' steps/s=' + '%.2f' % (self.window_steps / wall) +
+                 ' sim/wall=' + ratio]
+        lines.append(self.recorder.format_summary())
+
+        try:
+            with open(self.path, 'a') as f:
+                f.write('\n'.join(lines) + '\n\n')
+        except IOError:
+            pass
+
+        self.window_steps = 0
+        self.window_wall = now
+        self.window_sim = sim_time
+
+class NullProfiler:
+    """
+    Used when profiling is off, phases cost a single method call.
+    """
+    def __init__(self):
+        self.null_phase = contextlib.nullcontext()
+
+    def phase(self, name):
+        return self.null_phase
+
+    def step(self, sim_time):
+        pass
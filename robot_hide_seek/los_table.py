@@ -0,0 +1,244 @@
+'''
+Precomputed line of sight between cells of the arena. The arena is split in square cells of
+LOS_TABLE_RESOLUTION meters and, for every pair of cells, two bits are stored (bit-packed):
+    visible: the sightline between the cell centers crosses no wall
+    exact: every sightline between the two cells has the same answer
+A pair is exact when the center sightline stays more than half a cell diagonal away from every
+wall (visible), or when the 16 sightlines between the cell corners all strictly cross the same
+wall (blocked). Other pairs, near walls, fall back to the exact test.
+Usage: ros2 run robot_hide_seek build_los_table [resolution] [path]
+'''
+
+import sys
+import os
+import time
+from math import floor, ceil, sqrt
+
+import numpy as np
+
+from robot_hide_seek.utils import *
+from robot_hide_seek.visibility import WallSet, ARENA_WALLS
+
+def point_segment_distance(px, py, ax, ay, bx, by):
+    dx = bx - ax
+    dy = by - ay
+    length = dx ** 2 + dy ** 2
+
+    t = np.where(length == 0, 0, ((px - ax) * dx + (py - ay) * dy) / np.where(length == 0, 1, length))
+    t = np.clip(t, 0, 1)
+
+    return np.sqrt((ax + t * dx - px) ** 2 + (ay + t * dy - py) ** 2)
+
+def cross(px, py, qx, qy, rx, ry):
+    return (qy - py) * (rx - qx) - (qx - px) * (ry - qy)
+
+class LosTableBuilder:
+
+    def __init__(self, resolution=LOS_TABLE_RESOLUTION, walls=WALLS):
+        self.resolution = resolution
+        self.walls = np.array(walls, dtype=float).reshape(-1, 2, 2)
+        self.wall_set = WallSet(walls)
+
+        self.xmin = float(self.walls[:, :, 0].min())
+        self.ymin = float(self.walls[:, :, 1].min())
+        self.nx = ceil((float(self.walls[:, :, 0].max()) - self.xmin) / resolution)
+        self.ny = ceil((float(self.walls[:, :, 1].max()) - self.ymin) / resolution)
+
+        i, j = np.meshgrid(np.arange(self.nx), np.arange(self.ny), indexing='ij')
+        self.cx = (self.xmin + (i.ravel() + 0.5) * resolution)
+        self.cy = (self.ymin + (j.ravel() + 0.5) * resolution)
+
+        # Corners relative to the center, (4,)
+        half = resolution / 2
+        self.corner_dx = np.array([-half, half, half, -half])
+        self.corner_dy = np.array([-half, -half, half, half])
+
+    def build(self):
+        n = len(self.cx)
+        visible = np.zeros((n, n), dtype=bool)
+        exact = np.zeros((n, n), dtype=bool)
+
+        ax, ay = self.wall_set.ax, self.wall_set.ay
+        bx, by = self.wall_set.bx, self.wall_set.by
+
+        centers = np.stack([self.cx, self.cy], axis=1)
+        # Distance from every cell center to every wall, (n, walls)
+        center_wall = point_segment_distance(self.cx[:, None], self.cy[:, None], ax, ay, bx, by)
+
+        # Corners of every cell, (4, n, 1) and their side of every wall line, (4, n, walls)
+        corner_x = (self.cx[None, :] + self.corner_dx[:, None])[:, :, None]
+        corner_y = (self.cy[None, :] + self.corner_dy[:, None])[:, :, None]
+        corner_side = cross(ax, ay, bx, by, corner_x, corner_y)
+        side_pos = (corner_side > 0).all(axis=0)
+        side_neg = (corner_side < 0).all(axis=0)
+
+        margin = self.resolution / 2 * sqrt(2) + GRID_EPS
+
+        for a in range(n):
+            visible[a] = ~self.wall_set.blocked(centers[a], centers)
+
+            # Sightline to wall distance, sightlines through a wall are blocked anyway
+            clearance = np.minimum(center_wall[a][None, :], center_wall)
+            clearance = np.minimum(clearance, point_segment_distance(ax, ay, self.cx[a], self.cy[a], self.cx[:, None], self.cy[:, None]))
+            clearance = np.minimum(clearance, point_segment_distance(bx, by, self.cx[a], self.cy[a], self.cx[:, None], self.cy[:, None]))
+            exact_visible = visible[a] & (clearance.min(axis=1) > margin)
+
+            # Both cells strictly on opposite sides of the wall line...
+            opposite = (side_pos[a][None, :] & side_neg) | (side_neg[a][None, :] & side_pos)
+
+            # ...and the wall endpoints strictly on opposite sides of each corner to corner sightline
+            crosses = opposite.copy()
+            for k in range(4):
+                px, py = corner_x[k, a], corner_y[k, a]
+                end_a = cross(px, py, corner_x, corner_y, ax, ay)
+                end_b = cross(px, py, corner_x, corner_y, bx, by)
+                crosses &= (end_a * end_b < 0).all(axis=0)
+
+            exact[a] = exact_visible | (~visible[a] & crosses.any(axis=1))
+
+        return visible, exact
+
+    def save(self, path, visible, exact):
+        np.savez_compressed(path,
+                            resolution=self.resolution,
+                            origin=np.array([self.xmin, self.ymin]),
+                            shape=np.array([self.nx, self.ny]),
+                            walls=self.walls,
+                            visible=np.packbits(visible.ravel()),
+                            exact=np.packbits(exact.ravel()))
+
+class LosTable:
+
+    def __init__(self, path=LOS_TABLE_PATH, walls=WALLS):
+        data = np.load(path)
+
+        if not np.array_equal(data['walls'], np.array(walls, dtype=float).reshape(-1, 2, 2)):
+            raise ValueError('Line of sight table ' + path + ' was built for other walls')
+
+        self.resolution = float(data['resolution'])
+        self.xmin, self.ymin = data['origin'].tolist()
+        self.nx, self.ny = data['shape'].tolist()
+        self.n = self.nx * self.ny
+        # Indexing bytes is faster than indexing NumPy arrays one element at a time
+        self.visible = data['visible'].tobytes()
+        self.exact = data['exact'].tobytes()
+        # Unpacked copies for batches
+        self.visible_bits = np.unpackbits(data['visible'])
+        self.exact_bits = np.unpackbits(data['exact'])
+
+        self.fallback = WallSet(walls)
+        self.hits = 0
+        self.misses = 0
+
+    def cell(self, pos):
+        i = floor((pos[0] - self.xmin) / self.resolution)
+        j = floor((pos[1] - self.ymin) / self.resolution)
+
+        if not (0 <= i < self.nx and 0 <= j < self.ny):
+            return None
+
+        return i * self.ny + j
+
+    def bit(self, packed, index):
+        return (packed[index >> 3] >> (7 - (index & 7))) & 1
+
+    def lookup(self, pos1, pos2):
+        # True/False, or None when the table is not exact for these cells
+        a = self.cell(pos1)
+        b = self.cell(pos2)
+
+        if a is None or b is None:
+            return None
+
+        index = a * self.n + b
+
+        if not self.bit(self.exact, index):
+            return None
+
+        return bool(self.bit(self.visible, index))
+
+    def can_see(self, angle, pos1, pos2):
+        if not -FOV_ANGLE <= angle <= FOV_ANGLE:
+            return False
+
+        visible = self.lookup(pos1, pos2)
+
+        if visible is None:
+            self.misses += 1
+            return not self.fallback.blocked_one(pos1, pos2)
+
+        self.hits += 1
+        return visible
+
+    def cells(self, pos):
+        i = np.floor((pos[..., 0] - self.xmin) / self.resolution).astype(int)
+        j = np.floor((pos[..., 1] - self.ymin) / self.resolution).astype(int)
+        inside = (i >= 0) & (i < self.nx) & (j >= 0) & (j < self.ny)
+
+        return np.where(inside, i * self.ny + j, -1)
+
+    def can_see_batch(self, angles, pos1, pos2):
+        if len(angles) < VISIBILITY_BATCH_MIN:
+            single = np.ndim(pos1) == 1
+            angles, pos1, pos2 = np.asarray(angles, dtype=float).tolist(), np.asarray(pos1, dtype=float).tolist(), np.asarray(pos2, dtype=float).tolist()
+            return np.array([self.can_see(angle, pos1 if single else pos1[i], pos2[i]) for i, angle in enumerate(angles)], dtype=bool)
+
+        angles = np.asarray(angles, dtype=float)
+        pos2 = np.asarray(pos2, dtype=float)
+        pos1 = np.broadcast_to(np.asarray(pos1, dtype=float), pos2.shape)
+
+        in_fov = (angles >= -FOV_ANGLE) & (angles <= FOV_ANGLE)
+        a = self.cells(pos1)
+        b = self.cells(pos2)
+        known = in_fov & (a >= 0) & (b >= 0)
+
+        index = np.where(known, a * self.n + b, 0)
+        exact = known & self.exact_bits[index].astype(bool)
+        visible = exact & self.visible_bits[index].astype(bool)
+
+        # Pairs near walls or outside the table use the exact test
+        missed = in_fov & ~exact
+        if missed.any():
+            visible[missed] = ~self.fallback.blocked(pos1[missed], pos2[missed])
+
+        self.hits += int(exact.sum())
+        self.misses += int(missed.sum())
+
+        return visible
+
+def arena_visibility(logger=None):
+    # Table lookups when USE_LOS_TABLE is set and a table for WALLS was built, exact tests otherwise
+    if USE_LOS_TABLE and os.path.exists(LOS_TABLE_PATH):
+        try:
+            return LosTable(LOS_TABLE_PATH)
+        except ValueError as error:
+            if logger is not None:
+                logger.warn(str(error))
+
+    return ARENA_WALLS
+
+def main(args=None):
+    resolution = float(sys.argv[1]) if len(sys.argv) > 1 else LOS_TABLE_RESOLUTION
+    path = sys.argv[2] if len(sys.argv) > 2 else LOS_TABLE_PATH
+
+    builder = LosTableBuilder(resolution)
+
+    start = time.time()
+    visible, exact = builder.build()
+    build_time = time.time() - start
+
+    builder.save(path, visible, exact)
+
+    n = len(builder.cx)
+    packed_bytes = 2 * ceil(n * n / 8)
+
+    print(str(builder.nx) + 'x' + str(builder.ny) + ' cells of ' + str(resolution) + 'm, ' + str(n * n) + ' pairs')
+    print('build time: ' + '%.1f' % build_time + 's')
+    print('memory: ' + '%.2f' % (packed_bytes / 2 ** 20) + 'MiB packed, ' + '%.2f' % (os.path.getsize(path) / 2 ** 20) + 'MiB on disk')
+    print('exact: ' + '%.1f' % (100 * exact.mean()) + '% of pairs (visible ' + '%.1f' % (100 * (exact & visible).mean()) +
+          '%, blocked ' + '%.1f' % (100 * (exact & ~visible).mean()) + '%), the rest falls back to the exact test')
+    print('saved to ' + path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+'''
+Tiles several copies of the 2x2 arena in a single Gazebo world.
+Robots of arena i are namespaced under /arena<i> (e.g. /arena3/seeker_0/scan),
+walls and robots are offset by arena_origin(i).
+Usage: make_arena_world [n_arenas] [columns]
+'''
+
+import sys
+import copy
+import xml.etree.ElementTree as ET
+
+from robot_hide_seek.utils import *
+
+BASE_WORLD = './worlds/hide_seek_2x2.model'
+ARENAS_WORLD = './worlds/hide_seek_arenas.model'
+MODELS_PATH = './models/'
+
+def offset_pose(pose, origin):
+    values = [float(value) for value in pose.split()]
+    values[0] += origin[0]
+    values[1] += origin[1]
+
+    return ' '.join(str(value) for value in values)
+
+def robot_model(robot, namespace, pose):
+    model = ET.parse(MODELS_PATH + robot + '/model.sdf').getroot().find('model')
+    model.set('name', entity_name(namespace, robot))
+
+    for element in model.iter():
+        if element.tag == 'namespace' and element.text == '/' + robot:
+            element.text = namespace + '/' + robot
+
+        elif element.tag == 'argument' and element.text.endswith(':=' + robot + '/scan'):
+            element.text = element.text.replace(':=' + robot, ':=' + namespace.strip('/') + '/' + robot)
+
+    model.find('pose').text = pose
+
+    return model
+
+def make_world(n_arenas, columns):
+    tree = ET.parse(BASE_WORLD)
+    world = tree.getroot().find('world')
+
+    arena_includes = [include for include in world.findall('include') if include.find('pose') is not None]
+
+    for include in arena_includes:
+        world.remove(include)
+
+    for arena in range(n_arenas):
+        namespace = arena_namespace(arena)
+        origin = arena_origin(arena, columns)
+
+        for include in arena_includes:
+            uri = include.find('uri').text
+            pose = offset_pose(include.find('pose').text, origin)
+            robot = uri.replace('model://', '')
+
+            if robot in START_POSES:
+                world.append(robot_model(robot, namespace, pose))
+                continue
+
+            include = copy.deepcopy(include)
+            include.find('pose').text = pose
+            include.find('name').text = entity_name(namespace, include.find('name').text)
+            world.append(include)
+
+    # Provides /gazebo/set_entity_state, used to reset one arena without touching the others
+    if world.find("plugin[@name='gazebo_ros_state']") is None:
+        plugin = ET.SubElement(world, 'plugin', name='gazebo_ros_state', filename='libgazebo_ros_state.so')
+        ros = ET.SubElement(plugin, 'ros')
+        ET.SubElement(ros, 'namespace').text = '/gazebo'
+        ET.SubElement(plugin, 'update_rate').text = '1.0'
+
+    return tree
+
+def main(args=None):
+    n_arenas = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else ARENA_COLUMNS
+
+    tree = make_world(n_arenas, columns)
+    tree.write(ARENAS_WORLD, xml_declaration=True, encoding='utf-8')
+
+    print("Wrote " + str(n_arenas) + " arenas to " + ARENAS_WORLD)
+
+if __name__ == '__main__':
+    main()
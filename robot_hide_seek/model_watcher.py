@@ -0,0 +1,83 @@
+'''
+Picks up new weights saved in <save_path>/model while a game is running. The checkpoint files
+are polled every MODEL_WATCH_PERIOD seconds, and once they stop changing (MODEL_WATCH_SETTLE
+seconds, so a checkpoint being written is not read) a new DeepQ is loaded on the watcher's
+thread and handed to on_load. Callers swap their model reference there, scans in flight finish
+on the old model and the next one uses the new one.
+'''
+
+import os
+import threading
+import time
+
+from robot_hide_seek.utils import *
+
+def checkpoint_version(save_path):
+    # Newest modification time of the checkpoint files, None while there is none
+    directory = os.path.join(save_path, 'model')
+
+    try:
+        times = [os.path.getmtime(os.path.join(directory, name)) for name in os.listdir(directory)]
+    except OSError:
+        return None
+
+    return max(times) if times else None
+
+def load_policy(save_path, strict=True):
+    # Imported here so nodes using a policy server do not pull in Keras
+    from robot_hide_seek import deepqlearn
+
+    deepQ = deepqlearn.DeepQ(OBSERVATION_SIZE, 5, save_path=save_path)
+    deepQ.initPlay(strict=strict)
+    return deepQ
+
+class ModelWatcher:
+
+    def __init__(self, save_path, on_load, period=MODEL_WATCH_PERIOD, settle=MODEL_WATCH_SETTLE, logger=None):
+        self.save_path = save_path
+        self.on_load = on_load
+        self.period = period
+        self.settle = settle
+        self.logger = logger
+
+        # The checkpoint loaded at startup
+        self.version = checkpoint_version(save_path)
+        self.reloads = 0
+
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='model_watcher', daemon=True)
+        self.thread.start()
+
+    def log(self, message):
+        if self.logger is not None:
+            self.logger.info(message)
+        else:
+            print(message)
+
+    def run(self):
+        while not self.stopped.wait(self.period):
+            version = checkpoint_version(self.save_path)
+
+            if version is None or version == self.version:
+                continue
+
+            if time.time() - version < self.settle:
+                continue
+
+            try:
+                deepQ = load_policy(self.save_path)
+            except Exception as error:
+                # Tried again when the checkpoint changes
+                self.log('Could not load ' + self.save_path + ': ' + str(error))
+                self.version = version
+                continue
+
+            # version was read before loading, a checkpoint written meanwhile is loaded on the next poll
+            self.version = version
+            self.reloads += 1
+            self.on_load(deepQ)
+            self.log('Loaded ' + self.save_path + ' checkpoint of ' + time.ctime(version))
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
@@ -0,0 +1,82 @@
+'''
+Bounded LRU cache in front of a policy. Observations are quantized to multiples of
+POLICY_CACHE_RESOLUTION (a value, or one per input) and the network is evaluated on the
+quantized observation, so the action returned for any observation is the policy's action at a
+point at most resolution / 2 away in every input (max_error). Observations with an inf or NaN
+input bypass the cache (counted in bypassed): the policy replaces an inf follow angle with a
+random one on every call, so a cached action would freeze one draw. Entries are dropped when the
+policy's version (shared policies and policy server clients count their model swaps) changes.
+'''
+
+import threading
+from math import isfinite
+from collections import OrderedDict
+
+from robot_hide_seek.utils import *
+
+class PolicyCache:
+
+    def __init__(self, size=POLICY_CACHE_SIZE, resolution=POLICY_CACHE_RESOLUTION):
+        self.size = size
+        self.resolution = resolution
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.version = 0
+
+    def resolutions(self, n):
+        if isinstance(self.resolution, (list, tuple)):
+            return self.resolution
+
+        return [self.resolution] * n
+
+    def max_error(self, n=OBSERVATION_SIZE):
+        return [resolution / 2 for resolution in self.resolutions(n)]
+
+    def key(self, observation):
+        return tuple(round(value / resolution) for value, resolution in zip(observation, self.resolutions(len(observation))))
+
+    def predict(self, policy, observation):
+        if not all(isfinite(value) for value in observation):
+            self.bypassed += 1
+            return policy.predict(observation)
+
+        key = self.key(observation)
+        version = getattr(policy, 'version', 0)
+
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+
+            action = self.entries.get(key)
+
+            if action is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return action
+
+            self.misses += 1
+
+        # Cell center
+        quantized = [index * resolution for index, resolution in zip(key, self.resolutions(len(observation)))]
+        action = policy.predict(quantized)
+
+        with self.lock:
+            self.entries[key] = action
+            self.entries.move_to_end(key)
+
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+        return action
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,236 @@
+'''
+Policy server: one process per team loads its Deep Q-Learn model and answers the team's robots
+over a Unix socket (policy_socket(team)). Requests arriving within POLICY_BATCH_WINDOW of the
+first one (up to POLICY_BATCH_MAX) are evaluated in a single forward pass. The model is swapped
+atomically: SIGHUP (or, with WATCH_MODEL, a new checkpoint) reloads the weights from save_path
+in the background, batches already started finish on the old model.
+Messages are length prefixed: request [uint32 n][n float64 observation], reply [int32 action]
+[uint32 model version]. A request with n = 0 only asks for the model version.
+Usage: ros2 run robot_hide_seek policy_server <hider|seeker> [save_path] [socket]
+'''
+
+import os
+import sys
+import time
+import queue
+import signal
+import socket
+import struct
+import threading
+from array import array
+
+from robot_hide_seek.utils import *
+from robot_hide_seek.model_watcher import ModelWatcher, load_policy
+
+HEADER = struct.Struct('<I')
+REPLY = struct.Struct('<iI')
+STOP_ACTION = 3
+
+def policy_socket(team):
+    return os.path.join(POLICY_SOCKET_DIR, team + '_policy.sock')
+
+def recv_exactly(connection, size):
+    data = b''
+
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+
+        if not chunk:
+            raise ConnectionError('Policy connection closed')
+
+        data += chunk
+
+    return data
+
+class Request:
+
+    def __init__(self, observation):
+        self.observation = observation
+        self.action = None
+        self.version = 0
+        self.done = threading.Event()
+
+class PolicyServer:
+
+    def __init__(self, path, save_path, window=POLICY_BATCH_WINDOW, max_batch=POLICY_BATCH_MAX):
+        self.path = path
+        self.save_path = save_path
+        self.window = window
+        self.max_batch = max_batch
+
+        self.deepQ = load_policy(save_path, strict=False)
+        # Sent with every reply, so clients know when cached actions are from an old model
+        self.version = 0
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.served = 0
+
+        if os.path.exists(path):
+            os.remove(path)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.bind(path)
+        self.socket.listen()
+
+    def load(self):
+        try:
+            self.swap(load_policy(self.save_path))
+        except Exception as error:
+            print('Could not load ' + self.save_path + ': ' + str(error))
+
+    def swap(self, deepQ):
+        # A single reference assignment, the batcher reads it once per batch
+        self.deepQ = deepQ
+        self.version += 1
+
+    def reload(self):
+        threading.Thread(target=self.load, daemon=True).start()
+
+    def serve(self):
+        threading.Thread(target=self.batch_loop, daemon=True).start()
+
+        while True:
+            connection, _ = self.socket.accept()
+            threading.Thread(target=self.connection_loop, args=(connection,), daemon=True).start()
+
+    def connection_loop(self, connection):
+        try:
+            while True:
+                n = HEADER.unpack(recv_exactly(connection, HEADER.size))[0]
+
+                if n == 0:
+                    connection.sendall(REPLY.pack(STOP_ACTION, self.version))
+                    continue
+
+                observation = array('d')
+                observation.frombytes(recv_exactly(connection, 8 * n))
+
+                request = Request(observation.tolist())
+                self.requests.put(request)
+                request.done.wait()
+
+                connection.sendall(REPLY.pack(request.action, request.version))
+        except (ConnectionError, OSError):
+            connection.close()
+
+    def batch_loop(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.perf_counter() + self.window
+
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+
+                if remaining <= 0:
+                    break
+
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Version before the model: swap() replaces the model first, so an old model never gets a new version
+            version = self.version
+            deepQ = self.deepQ
+
+            try:
+                actions = deepQ.predictBatch([request.observation for request in batch])
+            except Exception as error:
+                # Robots waiting on this batch stop instead of hanging
+                print('Policy evaluation failed: ' + str(error))
+                actions = [STOP_ACTION for request in batch]
+
+            for request, action in zip(batch, actions):
+                request.action = int(action)
+                request.version = version
+                request.done.set()
+
+            self.batches += 1
+            self.served += len(batch)
+
+    def close(self):
+        self.socket.close()
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class PolicyClient:
+    """
+    Stands in for DeepQ in the game nodes, predict() is answered by the team's policy server.
+    """
+    def __init__(self, path, timeout=SERVICE_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.connection = None
+        self.model_version = 0
+        self.checked = 0.0
+
+    def connect(self):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self.timeout)
+        connection.connect(self.path)
+        return connection
+
+    def request(self, data):
+        if self.connection is None:
+            self.connection = self.connect()
+
+        try:
+            self.connection.sendall(data)
+            action, self.model_version = REPLY.unpack(recv_exactly(self.connection, REPLY.size))
+            self.checked = time.perf_counter()
+            return action
+        except (ConnectionError, OSError):
+            self.connection.close()
+            self.connection = None
+            raise
+
+    def predict(self, observation):
+        data = HEADER.pack(len(observation)) + array('d', observation).tobytes()
+
+        with self.lock:
+            # Once more on a new connection if the server restarted, the robot stops while it is down
+            for attempt in range(2):
+                try:
+                    return self.request(data)
+                except (ConnectionError, OSError):
+                    pass
+
+        return STOP_ACTION
+
+    @property
+    def version(self):
+        # Version of the server's model, asked again when no reply brought it for POLICY_VERSION_PERIOD
+        if time.perf_counter() - self.checked > POLICY_VERSION_PERIOD:
+            with self.lock:
+                try:
+                    self.request(HEADER.pack(0))
+                except (ConnectionError, OSError):
+                    pass
+
+        return self.model_version
+
+def main(args=None):
+    team = sys.argv[1] if len(sys.argv) > 1 else 'seeker'
+    save_path = sys.argv[2] if len(sys.argv) > 2 else './training_results/' + team
+    path = sys.argv[3] if len(sys.argv) > 3 else policy_socket(team)
+
+    server = PolicyServer(path, save_path)
+    signal.signal(signal.SIGHUP, lambda signum, frame: server.reload())
+    watcher = ModelWatcher(save_path, server.swap) if WATCH_MODEL else None
+
+    print('Serving ' + team + ' policy on ' + path)
+
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(str(server.served) + ' requests in ' + str(server.batches) + ' batches')
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+'''
+NumPy processing of LaserScan messages. msg.ranges (an array of float32) is viewed without
+copying and the closest obstacle, the minimum of SCAN_SECTORS sectors (sector k centered on
+angle k * 2pi / SCAN_SECTORS, so sector 0 is straight ahead) and the clearance in front
+(minimum within SCAN_FRONT_ANGLE of the heading) are computed without per-beam Python.
+NaN ranges are treated as inf (no return).
+lidar_features() gives the LIDAR_SECTORS values of the observation fed to the Deep Q-Learn
+networks, reduced per sector with LIDAR_REDUCTION:
+    sample: beam k * n_beams // LIDAR_SECTORS of sector k (ranges[0], ranges[45], ... on 360
+            beams, the beams the existing models were trained with). Picked by index, not by
+            angle: Gazebo's scanner has an angle_increment of 6.28 / 359, not 2pi / 360
+    min, mean: over the sector's beams (mean of the beams with a return, inf if none)
+    quantile: LIDAR_QUANTILE quantile of the sector's beams (lower value, inf counts as far)
+'''
+
+from array import array
+from collections import namedtuple
+from math import inf
+
+import numpy as np
+
+from robot_hide_seek.utils import *
+
+Scan = namedtuple('Scan', ['min_range', 'min_angle', 'sectors', 'clearance'])
+
+def ranges_view(msg):
+    if isinstance(msg.ranges, array):
+        return np.frombuffer(msg.ranges, dtype=np.float32)
+
+    return np.asarray(msg.ranges, dtype=np.float32)
+
+class ScanLayout:
+    """
+    Beam to sector assignment of a scanner, computed once from angle_min/angle_increment.
+    Beams are gathered so every sector, and then the front cone, is contiguous, and everything
+    is reduced with a single np.fmin.reduceat (fmin ignores NaN).
+    """
+    def __init__(self, angle_min, angle_increment, n_beams, n_sectors=SCAN_SECTORS):
+        self.n_sectors = n_sectors
+
+        angles = (angle_min + np.arange(n_beams) * angle_increment) % (2 * pi)
+        width = 2 * pi / n_sectors
+        sector = np.floor(((angles + width / 2) % (2 * pi)) / width).astype(int) % n_sectors
+        # Beams within SCAN_FRONT_ANGLE of the heading, either side of 0
+        front = np.flatnonzero(np.minimum(angles, 2 * pi - angles) <= SCAN_FRONT_ANGLE)
+
+        counts = np.append(np.bincount(sector, minlength=n_sectors), len(front))
+        self.order = np.concatenate([np.argsort(sector, kind='stable'), front])
+        self.starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        # reduceat returns the next group's first beam for empty groups
+        self.empty = counts == 0
+        self.starts = np.minimum(self.starts, max(0, len(self.order) - 1))
+
+        # Evenly spaced beam indices, as the hard-coded ranges[0], ranges[45], ...
+        self.centers = np.arange(n_sectors) * n_beams // n_sectors
+
+        # Sector beams as rows, padded with index n_beams (an inf appended to the ranges)
+        sector_counts = counts[:n_sectors]
+        self.groups = np.full((n_sectors, max(1, sector_counts.max(initial=0))), n_beams)
+        for k, start in enumerate(self.starts[:n_sectors]):
+            self.groups[k, :sector_counts[k]] = self.order[start:start + sector_counts[k]]
+        self.sector_counts = sector_counts
+
+    def minima(self, ranges):
+        # Sector minima followed by the front clearance
+        if len(self.order) == 0:
+            return np.full(self.n_sectors + 1, inf)
+
+        minima = np.fmin.reduceat(ranges[self.order], self.starts)
+
+        if self.empty.any():
+            minima[self.empty] = inf
+
+        # Groups where every beam is NaN
+        return np.fmin(minima, inf)
+
+layouts = {}
+
+def layout(msg, n_sectors=SCAN_SECTORS):
+    key = (msg.angle_min, msg.angle_increment, len(msg.ranges), n_sectors)
+
+    if key not in layouts:
+        layouts[key] = ScanLayout(msg.angle_min, msg.angle_increment, len(msg.ranges), n_sectors)
+
+    return layouts[key]
+
+def process(msg, n_sectors=SCAN_SECTORS):
+    ranges = ranges_view(msg)
+
+    if len(ranges) == 0:
+        return Scan(inf, msg.angle_min, np.full(n_sectors, inf), inf)
+
+    # First closest beam, as the original loop. argmin stops at a NaN, only then are they replaced
+    i = int(ranges.argmin())
+
+    if ranges[i] != ranges[i]:
+        ranges = np.where(np.isnan(ranges), np.float32(inf), ranges)
+        i = int(ranges.argmin())
+
+    minima = layout(msg, n_sectors).minima(ranges)
+
+    return Scan(float(ranges[i]), msg.angle_min + i * msg.angle_increment, minima[:n_sectors], float(minima[n_sectors]))
+
+def lidar_features(msg, n_sectors=LIDAR_SECTORS, reduction=LIDAR_REDUCTION):
+    ranges = ranges_view(msg)
+
+    if len(ranges) == 0:
+        return np.full(n_sectors, inf, dtype=np.float32)
+
+    beams = layout(msg, n_sectors)
+
+    if reduction == 'sample':
+        return ranges[beams.centers]
+
+    ranges = np.where(np.isnan(ranges), np.float32(inf), ranges)
+
+    if reduction == 'min':
+        return beams.minima(ranges)[:n_sectors]
+
+    values = np.append(ranges, np.float32(inf))[beams.groups]
+
+    if reduction == 'mean':
+        finite = np.isfinite(values)
+        counts = finite.sum(axis=1)
+        sums = np.where(finite, values, 0).sum(axis=1)
+        return np.where(counts > 0, sums / np.maximum(counts, 1), inf).astype(np.float32)
+
+    if reduction == 'quantile':
+        # Padding sorts last, so the index only runs over the sector's own beams
+        index = np.floor(LIDAR_QUANTILE * np.maximum(beams.sector_counts - 1, 0)).astype(int)
+        features = np.sort(values, axis=1)[np.arange(n_sectors), index]
+        return np.where(beams.sector_counts > 0, features, np.float32(inf))
+
+    raise ValueError('Unknown LIDAR_REDUCTION ' + str(reduction))
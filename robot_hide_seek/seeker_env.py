@@ -15,8 +15,9 @@ import time
 import threading
 import math
 
-from robot_hide_seek import seeker_train, gazebo_connection, hider, game_controller
+from robot_hide_seek import seeker_train, gazebo_connection, hider, game_controller, start_states, intra
 from robot_hide_seek.utils import *
+from robot_hide_seek.latency import StepProfiler, NullProfiler
 
 reg = register(
     id='seekerEnv-v0',
@@ -24,13 +25,21 @@ reg = register(
 )
 
 class SeekerEnv(gym.Env):
-    def __init__(self):
-        rclpy.init()
+    def __init__(self, namespace='', origin=None):
+        # Several arena environments may share the same process
+        if not rclpy.ok():
+            rclpy.init()
         self.executor = rclpy.executors.MultiThreadedExecutor(5)
 
-        self.hiders = [hider.Hider(0), hider.Hider(1)]
-        self.seekers = [seeker_train.SeekerTrain(0), seeker_train.SeekerTrain(1)]
-        self.game_controller = game_controller.HideSeek()
+        self.namespace = namespace
+        self.origin = origin if origin is not None else [0.0, 0.0]
+
+        # Game messages and the clock are passed in-process, only Gazebo topics go through DDS
+        self.bus = intra.IntraProcessBus() if INTRA_PROCESS else None
+
+        self.hiders = [hider.Hider(0, namespace, self.bus), hider.Hider(1, namespace, self.bus)]
+        self.seekers = [seeker_train.SeekerTrain(0, namespace, self.bus), seeker_train.SeekerTrain(1, namespace, self.bus)]
+        self.game_controller = game_controller.HideSeek(namespace, self.origin, self.bus)
 
         for hider_node in self.hiders:
             self.executor.add_node(hider_node)
@@ -41,12 +50,19 @@ class SeekerEnv(gym.Env):
         self.executor_thread = threading.Thread(target=self.run_executor, daemon=True)
         self.executor_thread.start()
 
-        self.gazebo = gazebo_connection.GazeboConnection(self.game_controller)
+        self.gazebo = gazebo_connection.GazeboConnection(self.game_controller, namespace, self.origin)
         self.action_space = spaces.Discrete(5)
         self.reward_range = (-math.inf, math.inf)
 
         self.current_seeker = 0
 
+        self.profiler = StepProfiler('seekers_profile.txt') if PROFILE_STEPS else NullProfiler()
+
+        # Poses at the moment seekers are released, to skip the hiders' head start
+        self.start_states = None
+        if USE_START_STATE_CACHE and (FAST_RESET or namespace):
+            self.start_states = start_states.StartStateLibrary('./training_results/seeker_start_states.txt')
+
         self._seed()
 
     def _seed(self, seed = None):
@@ -56,23 +72,52 @@ class SeekerEnv(gym.Env):
     def reset(self):
         self.current_seeker = 0
 
-        for hider_node in self.hiders:
-            hider_node.gameover = False
-            hider_node.time = 0
-            hider_node.reset()
-        for seeker_node in self.seekers:
-            seeker_node.result = 0
-            seeker_node.time = 0
-            seeker_node.reset()
-        self.game_controller.time = 0
-        self.game_controller.reset()
+        # Some head starts are still played to keep adding new start states
+        cached = self.start_states is not None and self.start_states.ready() and \
+                 self.np_random.uniform() >= START_STATE_REFRESH
+
+        with self.profiler.phase('reset'):
+            if FAST_RESET or self.namespace:
+                self.stop_robots()
+                # Only the robots are moved, the clock keeps running and game timing restarts explicitly
+                if cached:
+                    self.gazebo.resetRobots(self.start_states.sample(self.np_random))
+                    elapsed = SECONDS_SEEKER_START
+                else:
+                    self.gazebo.resetRobots(self.start_poses())
+                    elapsed = 0
+
+                for node in self.hiders + self.seekers:
+                    node.restart(elapsed)
+                self.game_controller.restart(elapsed, notify=False)
 
-        self.gazebo.resetSim()
-        self.gazebo.unpauseSim()
+            else:
+                for hider_node in self.hiders:
+                    hider_node.gameover = False
+                    hider_node.time = 0
+                    hider_node.reset()
+                for seeker_node in self.seekers:
+                    seeker_node.result = 0
+                    seeker_node.time = 0
+                    seeker_node.reset()
+                self.game_controller.time = 0
+                self.game_controller.reset()
 
-        while True:
-            if self.game_controller.time >= SECONDS_SEEKER_START:
-                break
+                self.gazebo.wait(self.gazebo.resetSim())
+
+        with self.profiler.phase('head_start'):
+            self.gazebo.wait(self.gazebo.unpauseSim())
+
+            while True:
+                # Restored start states have no scan yet
+                if self.game_controller.time >= SECONDS_SEEKER_START and all(seeker.snapshot.lidar for seeker in self.seekers):
+                    break
+
+            if self.start_states is not None and not cached:
+                self.start_states.add(self.capture_start_state())
+
+        # Observations are read once the world is actually paused
+        self.gazebo.wait(self.gazebo.pauseSim())
 
         observations = []
         observations.append(self.take_observation())
@@ -80,13 +125,61 @@ class SeekerEnv(gym.Env):
         observations.append(self.take_observation())
         self.current_seeker = (self.current_seeker + 1) % len(self.seekers)
 
-        self.gazebo.pauseSim()
-
         return observations
 
     def step(self, action):
         seeker = self.seekers[self.current_seeker]
-        
+
+        repeat = action_repeat([action], [seeker.snapshot.lidar])
+
+        with self.profiler.phase('unpause'):
+            unpause = self.gazebo.unpauseSim()
+            vel = self.action_to_vel(action)
+            self.gazebo.wait(unpause)
+
+        with self.profiler.phase('publish'):
+            try:
+                seeker.vel_pub
+            except AttributeError:
+                pass
+            else:
+                seeker.vel_pub.publish(vel)
+
+            action_time = seeker.sim_time
+            last_seq = seeker.snapshot.seq
+
+        # The action is held for repeat periods with the simulation running, the reward of period k
+        # is discounted by DISCOUNT_FACTOR ** k (the learner discounts the next state by
+        # DISCOUNT_FACTOR ** repeat) and periods after the end of the game are not played.
+        # Scans are slower than a period, so each snapshot's reward is only added once
+        reward = 0
+        period = RUNNING_STEP / len(self.seekers)
+
+        for i in range(repeat):
+            # Instead of sleeping, wait for the first new observation covering the whole period
+            with self.profiler.phase('wait_observation'):
+                snapshot = seeker.wait_for_snapshot(action_time + (i + 1) * period, last_seq)
+
+            observation = self.take_observation(snapshot=snapshot)
+            period_reward, done = self.process_observation(observation)
+
+            if snapshot.seq > last_seq:
+                reward += DISCOUNT_FACTOR ** i * period_reward
+                last_seq = snapshot.seq
+
+            if done:
+                break
+
+        with self.profiler.phase('pause'):
+            self.gazebo.wait(self.gazebo.pauseSim())
+
+        self.profiler.step(self.game_controller.sim_time)
+
+        self.current_seeker = (self.current_seeker + 1) % len(self.seekers)
+
+        return observation, reward, done, {'repeat': i + 1}
+
+    def action_to_vel(self, action):
         vel = Twist()
 
         if action == 0: #Forward
@@ -105,29 +198,81 @@ class SeekerEnv(gym.Env):
             vel.linear.x = -SEEKER_LINEAR_SPEED
             vel.angular.z = 0.0
 
-        self.gazebo.unpauseSim()
+        return vel
 
-        try:
-            seeker.vel_pub
-        except AttributeError:
-            pass
-        else:
-            seeker.vel_pub.publish(vel)
+    def step_all(self, actions):
+        # One action per team member, applied together and advanced by RUNNING_STEP per repeat
+        repeat = action_repeat(actions, [seeker.snapshot.lidar for seeker in self.seekers])
 
-        time.sleep(RUNNING_STEP / len(self.seekers))
-        observation = self.take_observation()
-        self.gazebo.pauseSim()
+        with self.profiler.phase('unpause'):
+            unpause = self.gazebo.unpauseSim()
+            vels = [self.action_to_vel(action) for action in actions]
+            self.gazebo.wait(unpause)
 
-        reward, done = self.process_observation(observation)
+        with self.profiler.phase('publish'):
+            for seeker, vel in zip(self.seekers, vels):
+                seeker.vel_pub.publish(vel)
 
-        self.current_seeker = (self.current_seeker + 1) % len(self.seekers)
+            action_time = self.game_controller.sim_time
+            last_seqs = [seeker.snapshot.seq for seeker in self.seekers]
+
+        rewards = [0 for seeker in self.seekers]
+
+        for i in range(repeat):
+            with self.profiler.phase('wait_observation'):
+                snapshots = [seeker.wait_for_snapshot(action_time + (i + 1) * RUNNING_STEP, last_seqs[j]) for j, seeker in enumerate(self.seekers)]
+
+            observations = [self.take_observation(snapshot=snapshot) for snapshot in snapshots]
+            dones = []
+
+            for j, observation in enumerate(observations):
+                reward, done = self.process_observation(observation)
+                dones.append(done)
+
+                # A snapshot seen in an earlier period (wait timed out) is not counted again
+                if snapshots[j].seq > last_seqs[j]:
+                    rewards[j] += DISCOUNT_FACTOR ** i * reward
+                    last_seqs[j] = snapshots[j].seq
+
+            # The game ends for the whole team at once
+            if any(dones):
+                break
+
+        with self.profiler.phase('pause'):
+            self.gazebo.wait(self.gazebo.pauseSim())
+
+        self.profiler.step(self.game_controller.sim_time)
+
+        return observations, rewards, dones, {'repeat': i + 1}
+
+    def stop_robots(self):
+        for node in self.hiders + self.seekers:
+            node.vel_pub.publish(Twist())
+
+    def start_poses(self):
+        if RANDOM_START_POSES:
+            return sample_start_poses(self.np_random)
+
+        return START_POSES
+
+    def capture_start_state(self):
+        state = {}
+
+        for i in range(len(self.hiders)):
+            state['hider_' + str(i)] = self.game_controller.hider_pos[i][:2].tolist() + [float(self.game_controller.hider_yaw[i])]
+        for i in range(len(self.seekers)):
+            state['seeker_' + str(i)] = self.game_controller.seeker_pos[i][:2].tolist() + [float(self.game_controller.seeker_yaw[i])]
+
+        return state
 
-        return observation, reward, done, {}
+    def take_observation(self, seeker_id=None, snapshot=None):
+        if snapshot is None:
+            if seeker_id is None:
+                seeker_id = self.current_seeker
 
-    def take_observation(self):
-        sensors = self.seekers[self.current_seeker].lidar_sensors[:]     
+            snapshot = self.seekers[seeker_id].snapshot
 
-        return [sensors, self.seekers[self.current_seeker].follow_angle, self.seekers[self.current_seeker].follow_distance, self.seekers[self.current_seeker].time, self.seekers[self.current_seeker].result]
+        return [snapshot.lidar[:], snapshot.follow_angle, snapshot.follow_distance, snapshot.time, snapshot.result]
 
     def process_observation(self, observation):
         reward = 0
@@ -1,49 +1,69 @@
 from math import radians, degrees, isinf, pi, inf
+import threading
 
 import rclpy
 from rclpy.node import Node
 from rclpy.qos import qos_profile_sensor_data
 
-from std_msgs.msg import String
 from rosgraph_msgs.msg import Clock
 from sensor_msgs.msg import LaserScan
 from geometry_msgs.msg import Twist
 
 from robot_hide_seek.utils import *
+from robot_hide_seek import intra, game_msgs, scan
 
 class SeekerTrain(Node):
     follow_id = inf
     follow_distance = inf
     follow_angle = inf
+    assigned = False
     angles = []
     distances = []
+    clock = -1
+    sim_time = 0.0
+    start_time = 0
     time = -1
     lidar_sensors = []
     result = 0
+    snapshot = None
+    snapshot_timeouts = 0
 
-    def __init__(self, id):
-        super().__init__('seeker_' + str(id))
+    def __init__(self, id, namespace='', bus=None):
+        super().__init__('seeker_' + str(id), namespace=namespace or None)
 
-        self.node_topic = '/seeker_' + str(id)
+        self.namespace = namespace
+        self.node_topic = namespace + '/seeker_' + str(id)
 
-        self.game_sub = self.create_subscription(
-            String,
+        self.snapshot_condition = threading.Condition()
+        self.take_snapshot(0.0)
+
+        # Game-level channels go through bus when the whole game runs in this process
+        self.game_sub = intra.create_subscription(
+            self,
+            bus,
+            game_msgs.MSG_TYPE,
             self.node_topic + '/game',
             self.game_callback,
             10
         )
-        self.seeker_coord_sub = self.create_subscription(
-            String,
-            '/seekers',
+        self.seeker_coord_sub = intra.create_subscription(
+            self,
+            bus,
+            game_msgs.MSG_TYPE,
+            self.namespace + '/seekers',
             self.coord_callback,
             10
         )
-        self.seeker_coord_pub = self.create_publisher(
-            String,
-            '/seekers',
+        self.seeker_coord_pub = intra.create_publisher(
+            self,
+            bus,
+            game_msgs.MSG_TYPE,
+            self.namespace + '/seekers',
             10
         )
-        self.clock_sub = self.create_subscription(
+        self.clock_sub = intra.create_subscription(
+            self,
+            bus,
             Clock, 
             '/clock', 
             self.clock_callback,
@@ -70,40 +90,69 @@ class SeekerTrain(Node):
         self.lidar_sensors = []
 
     def clock_callback(self, msg):
-        if int(msg.clock.sec) < self.time:
+        if int(msg.clock.sec) < self.clock:
+            self.start_time = 0
             self.result = 0
             self.reset()
 
-        self.time = int(msg.clock.sec)
+        self.clock = int(msg.clock.sec)
+        self.sim_time = msg.clock.sec + msg.clock.nanosec * 1e-9
+        self.time = self.clock - self.start_time
+
+    def restart(self, elapsed=0):
+        self.start_time = self.clock - elapsed
+        self.time = elapsed
+        self.result = 0
+        self.reset()
+        self.take_snapshot(self.sim_time)
 
     def game_callback(self, msg):
-        if msg.data == START_MSG:
+        message = game_msgs.decode(msg)
+
+        if message.header == START_MSG:
             return
 
-        elif msg.data == GAMEOVER_MSG:
+        if message.header == GAMEOVER_MSG:
             self.endgame()
+            return
 
-        message = msg.data.rstrip().split('\n\n')
+        if message.header == RESET_MSG:
+            self.restart(message.elapsed)
+            return
 
-        if message[0] == POSITIONS_MSG_HEADER:
-            self.angles = [float(pos.split('\n')[0][7:]) for pos in message[1:]]
-            self.distances = [float(pos.split('\n')[1][10:]) for pos in message[1:]]
+        # Once the controller assigns targets, seekers stop sharing their distances
+        if message.header == ASSIGN_MSG:
+            self.assigned = True
+            self.follow_id = message.target if message.target >= 0 else inf
+            self.follow()
+            return
 
-            if self.seeker_coord_pub:
+        if message.header == POSITIONS_MSG_HEADER:
+            self.angles = message.angles
+            self.distances = message.distances
+
+            if self.assigned:
+                self.follow()
+
+            elif self.seeker_coord_pub:
                 self.share_distances()
 
-    def share_distances(self):
-        msg = String()
+    def follow(self):
+        if isinf(self.follow_id) or self.follow_id >= len(self.angles):
+            self.follow_angle = inf
+            self.follow_distance = inf
 
-        for dist in self.distances:
-            msg.data += str(dist) + '\n'
+        else:
+            self.follow_angle = self.angles[self.follow_id]
+            self.follow_distance = self.distances[self.follow_id]
 
-        self.seeker_coord_pub.publish(msg)
+    def share_distances(self):
+        self.seeker_coord_pub.publish(game_msgs.shared_distances(self.distances))
 
     def coord_callback(self, msg):
         if self.time < SECONDS_SEEKER_START:
             return
-        other_distances = msg.data.rstrip().split('\n')
+        other_distances = game_msgs.decode_distances(msg)
 
         if len(other_distances) > len(self.distances):
             return
@@ -111,7 +160,7 @@ class SeekerTrain(Node):
         min_difference = (inf, inf)
 
         for i, distance in enumerate(other_distances):
-            diff = self.distances[i] - float(distance)
+            diff = self.distances[i] - distance
 
             if diff < min_difference[1]:
                 min_difference = (i, diff)
@@ -122,7 +171,29 @@ class SeekerTrain(Node):
             self.follow_distance = self.distances[min_difference[0]]
 
     def lidar_callback(self, msg):
-        self.lidar_sensors = [msg.ranges[0], msg.ranges[45], msg.ranges[90], msg.ranges[135], msg.ranges[180], msg.ranges[225], msg.ranges[270], msg.ranges[315]]
+        self.lidar_sensors = scan.lidar_features(msg).tolist()
+        self.take_snapshot(msg.header.stamp.sec + msg.header.stamp.nanosec * 1e-9)
+
+    def take_snapshot(self, stamp):
+        # Built in this node's callbacks, which never run concurrently, so fields are consistent
+        with self.snapshot_condition:
+            seq = self.snapshot.seq + 1 if self.snapshot is not None else 0
+            self.snapshot = Snapshot(seq, stamp, self.lidar_sensors[:], self.follow_angle, self.follow_distance, self.time, self.result)
+            self.snapshot_condition.notify_all()
+
+    def wait_for_snapshot(self, stamp, after=-1, timeout=SNAPSHOT_TIMEOUT):
+        # First snapshot newer than seq after taken at or after stamp (sim time), or one with the game result.
+        # On timeout the latest one is returned, callers can tell it is old by its seq
+        with self.snapshot_condition:
+            fresh = self.snapshot_condition.wait_for(lambda: (self.snapshot.seq > after and self.snapshot.stamp >= stamp) or self.snapshot.result != 0, timeout)
+            snapshot = self.snapshot
+
+        if not fresh:
+            self.snapshot_timeouts += 1
+            self.get_logger().warn('No snapshot after ' + '%.2f' % stamp + 's within ' + str(timeout) +
+                                   's, latest is ' + str(snapshot.seq) + ' at ' + '%.2f' % snapshot.stamp + 's')
+
+        return snapshot
 
     def endgame(self):
         if self.time < SECONDS_SEEKER_START:
@@ -134,4 +205,5 @@ class SeekerTrain(Node):
         else:
             self.result = -1
 
-        self.reset()
\ No newline at end of file
+        self.reset()
+        self.take_snapshot(self.sim_time)
@@ -0,0 +1,61 @@
+'''
+Library of robot poses recorded at the moment the seekers are released.
+Seeker episodes can start from one of them instead of waiting SECONDS_SEEKER_START
+for the hiders to run away.
+Parallel training workers share the file, it is always replaced whole (written to a
+temporary file first), so a worker never reads a partially written library.
+'''
+
+import ast
+import os
+
+from robot_hide_seek.utils import *
+
+class StartStateLibrary:
+
+    def __init__(self, path, size=START_STATE_LIBRARY_SIZE):
+        self.path = path
+        self.size = size
+        self.states = []
+        self.next_replace = 0
+
+        if os.path.exists(self.path):
+            self.states = self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                states = ast.literal_eval(f.read().strip())
+        except (OSError, ValueError, SyntaxError) as error:
+            print('Could not read start states from ' + self.path + ', starting empty: ' + str(error))
+            return []
+
+        if not isinstance(states, list):
+            print('Could not read start states from ' + self.path + ', starting empty')
+            return []
+
+        return states[:self.size]
+
+    def ready(self):
+        return len(self.states) >= START_STATE_LIBRARY_MIN
+
+    def add(self, state):
+        if len(self.states) < self.size:
+            self.states.append(state)
+        else:
+            # Oldest recordings are replaced first
+            self.states[self.next_replace] = state
+            self.next_replace = (self.next_replace + 1) % self.size
+
+        self.save()
+
+    def sample(self, rng):
+        return self.states[rng.randint(len(self.states))]
+
+    def save(self):
+        temp_path = self.path + '.' + str(os.getpid()) + '.tmp'
+
+        with open(temp_path, 'w') as f:
+            f.write(str(self.states))
+
+        os.replace(temp_path, self.path)
@@ -1,10 +1,23 @@
 from math import atan2, pi, sqrt
+from collections import namedtuple
 from transformations import euler_from_quaternion
 
 N_HIDERS = 2
 N_SEEKERS = 2
 
 GAME_USES_TRAINING = True
+INFERENCE_WORKER = True
+USE_POLICY_SERVER = False
+POLICY_SOCKET_DIR = '/tmp/robot_hide_seek'
+POLICY_BATCH_WINDOW = 0.002
+POLICY_BATCH_MAX = 32
+POLICY_VERSION_PERIOD = 1.0
+WATCH_MODEL = False
+MODEL_WATCH_PERIOD = 5.0
+MODEL_WATCH_SETTLE = 1.0
+USE_POLICY_CACHE = False
+POLICY_CACHE_SIZE = 10000
+POLICY_CACHE_RESOLUTION = 0.05
 
 # Q-Learn Parameters
 ALPHA = 0.1
@@ -15,11 +28,55 @@ NEPISODES = 1000
 
 # Environment Parameters
 RUNNING_STEP = 0.1
+FAST_RESET = True
+RANDOM_START_POSES = False
+START_AREA_LIMIT = 2.2
+MIN_START_WALL_DISTANCE = 0.3
+MIN_START_DISTANCE = 1.0
+RESET_TIMEOUT = 2.0
+SNAPSHOT_TIMEOUT = 1.0
+SERVICE_TIMEOUT = 5.0
+LATENCY_SAMPLES = 1000
+PROFILE_STEPS = False
+PROFILE_DUMP_PERIOD = 60
+USE_START_STATE_CACHE = True
+START_STATE_LIBRARY_SIZE = 500
+START_STATE_LIBRARY_MIN = 50
+START_STATE_REFRESH = 0.05
+INTRA_PROCESS = True
+ACTION_REPEAT = 1
+DISCOUNT_FACTOR = 0.99
+ADAPTIVE_REPEAT = False
+ADAPTIVE_REPEAT_MAX = 4
+ADAPTIVE_REPEAT_CLEARANCE = 0.5
+
+# Parallel Training Parameters
+N_WORKERS = 4
+WORKER_BASE_DOMAIN_ID = 31
+WORKER_BASE_GAZEBO_PORT = 11346
+WORKER_SIM_STARTUP = 20
+WORKER_RESTART_DELAY = 5
+WORKER_TIMEOUT = 60
+WORKER_QUEUE_SIZE = 10000
+
+# Arena Parameters
+ARENA_SPACING = 7
+ARENA_COLUMNS = 2
+START_POSES = {
+    'hider_0': [1, 1, 0.7855],
+    'hider_1': [-1, -1, -2.3565],
+    'seeker_0': [1, -1, -0.7855],
+    'seeker_1': [-1, 1, 2.3565],
+}
 
 # Game Constants
 START_MSG = 'START'
 GAMEOVER_MSG = 'GAMEOVER'
+RESET_MSG = 'RESET'
 POSITIONS_MSG_HEADER = 'POSITIONS'
+DISTANCES_MSG_HEADER = 'DISTANCES'
+ASSIGN_MSG = 'ASSIGN'
+BINARY_GAME_MSGS = True
 HIDER_LINEAR_SPEED = 0.25
 SEEKER_LINEAR_SPEED = 0.2
 ROBOT_ANGULAR_SPEED = 1.57
@@ -34,6 +91,22 @@ DISTANCE_ENDGAME = 0.3
 GAME_TIME_LIMIT = 60
 TIME_REWARD = 10
 FOV_ANGLE = pi / 3
+GAME_TICK_RATE = 0.0
+CENTRAL_ASSIGNMENT = True
+ASSIGNMENT_RATE = 10.0
+WALL_GRID_MIN = 64
+VISIBILITY_BATCH_MIN = 16
+USE_LOS_TABLE = True
+LOS_TABLE_RESOLUTION = 0.1
+LOS_TABLE_PATH = './training_results/los_table.npz'
+GRID_EPS = 1e-9
+SCAN_SECTORS = 8
+SCAN_FRONT_ANGLE = pi / 8
+LIDAR_SECTORS = 8
+LIDAR_REDUCTION = 'sample'
+LIDAR_QUANTILE = 0.1
+# LIDAR_SECTORS ranges, follow angle, follow distance and game time
+OBSERVATION_SIZE = LIDAR_SECTORS + 3
 
 WALLS = [\
         [[-1, 0], [1, 0]], \
@@ -58,6 +131,21 @@ WALLS = [\
 # RIGHT LIMITS
 # LEFT LIMITS
 
+# Observation of a training robot, taken atomically. seq increases with every snapshot
+Snapshot = namedtuple('Snapshot', ['seq', 'stamp', 'lidar', 'follow_angle', 'follow_distance', 'time', 'result'])
+
+def arena_namespace(arena):
+    return '/arena' + str(arena)
+
+def arena_origin(arena, columns=ARENA_COLUMNS):
+    return [(arena % columns) * ARENA_SPACING, (arena // columns) * ARENA_SPACING]
+
+def entity_name(namespace, robot):
+    if not namespace:
+        return robot
+
+    return namespace.strip('/') + '_' + robot
+
 def get_yaw(orientation_q):
     orientation_list = [orientation_q.x, orientation_q.y, orientation_q.z, orientation_q.w]
     (yaw, pitch, roll) = euler_from_quaternion(orientation_list)
@@ -102,7 +190,51 @@ def can_see(angle, pos1, pos2):
 
     return True    
 
+def distance_to_segment(p, a, b):
+    dx = b[0] - a[0]
+    dy = b[1] - a[1]
+    length = dx ** 2 + dy ** 2
+
+    t = 0 if length == 0 else ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length
+    t = max(0, min(1, t))
+
+    return sqrt((a[0] + t * dx - p[0]) ** 2 + (a[1] + t * dy - p[1]) ** 2)
+
+def robot_names():
+    return ['hider_' + str(i) for i in range(N_HIDERS)] + ['seeker_' + str(i) for i in range(N_SEEKERS)]
+
+def sample_start_poses(rng):
+    poses = {}
+
+    for robot in robot_names():
+        while True:
+            pos = [rng.uniform(-START_AREA_LIMIT, START_AREA_LIMIT), rng.uniform(-START_AREA_LIMIT, START_AREA_LIMIT)]
+
+            if any(distance_to_segment(pos, wall[0], wall[1]) < MIN_START_WALL_DISTANCE for wall in WALLS):
+                continue
+
+            if any(sqrt((pos[0] - other[0]) ** 2 + (pos[1] - other[1]) ** 2) < MIN_START_DISTANCE for other in poses.values()):
+                continue
+
+            poses[robot] = [pos[0], pos[1], rng.uniform(-pi, pi)]
+            break
+
+    return poses
+
 def calc_distance(pos1, pos2):
     return sqrt(((pos1[0] - pos2[0]) ** 2) + \
                 ((pos1[1] - pos2[1]) ** 2) + \
-                ((pos1[2] - pos2[2]) ** 2))
\ No newline at end of file
+                ((pos1[2] - pos2[2]) ** 2))
+
+def action_repeat(actions, lidars):
+    # Control periods an action is held for. Forward/back are held longer the further every
+    # robot is from the walls, roughly one period per ADAPTIVE_REPEAT_CLEARANCE meters
+    # At least one period, so a step always has an observation
+    repeat = max(1, ACTION_REPEAT)
+
+    if not ADAPTIVE_REPEAT or any(action not in (0, 4) for action in actions) or not all(lidars):
+        return repeat
+
+    clearance = min(min(lidar) for lidar in lidars)
+
+    return max(repeat, int(min(ADAPTIVE_REPEAT_MAX, clearance / ADAPTIVE_REPEAT_CLEARANCE)))
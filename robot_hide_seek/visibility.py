@@ -0,0 +1,255 @@
+'''
+Vectorized version of utils.can_see. Wall endpoints are kept as NumPy arrays and sightlines
+are tested against every wall in one pass, with the same orientation test as utils.doIntersect
+(collinear points count as clockwise), so results are identical.
+For maps with many walls, WallGrid only tests the walls registered in the grid cells a
+sightline goes through.
+'''
+
+from math import floor, ceil, sqrt, inf
+
+import numpy as np
+
+from robot_hide_seek.utils import *
+
+def clockwise(px, py, qx, qy, rx, ry):
+    # Same expression as utils.orientation, True where it returns 1
+    return (qy - py) * (rx - qx) - (qx - px) * (ry - qy) > 0
+
+class WallSet:
+
+    def __init__(self, walls=WALLS):
+        self.walls = [[list(map(float, wall[0])), list(map(float, wall[1]))] for wall in walls]
+        walls = np.array(self.walls, dtype=float).reshape(-1, 2, 2)
+
+        self.ax = walls[:, 0, 0]
+        self.ay = walls[:, 0, 1]
+        self.bx = walls[:, 1, 0]
+        self.by = walls[:, 1, 1]
+
+    def __len__(self):
+        return len(self.walls)
+
+    def blocked(self, pos1, pos2):
+        # Sightlines from pos1 to pos2 (points or arrays of points, only x and y are used) crossing any wall
+        pos1 = np.asarray(pos1, dtype=float)
+        pos2 = np.asarray(pos2, dtype=float)
+
+        px, py = pos1[..., 0, None], pos1[..., 1, None]
+        qx, qy = pos2[..., 0, None], pos2[..., 1, None]
+
+        o1 = clockwise(px, py, qx, qy, self.ax, self.ay)
+        o2 = clockwise(px, py, qx, qy, self.bx, self.by)
+        o3 = clockwise(self.ax, self.ay, self.bx, self.by, px, py)
+        o4 = clockwise(self.ax, self.ay, self.bx, self.by, qx, qy)
+
+        return ((o1 != o2) & (o3 != o4)).any(axis=-1)
+
+    def blocked_one(self, pos1, pos2):
+        for wall in self.walls:
+            if doIntersect(pos1, pos2, wall[0], wall[1]):
+                return True
+
+        return False
+
+    def can_see(self, angle, pos1, pos2):
+        # A single sightline is cheaper to test in Python than to hand over to NumPy
+        if not -FOV_ANGLE <= angle <= FOV_ANGLE:
+            return False
+
+        return not self.blocked_one(pos1, pos2)
+
+    def can_see_batch(self, angles, pos1, pos2):
+        # pos1 may be a single point, seen from every position of pos2
+        if len(angles) < VISIBILITY_BATCH_MIN:
+            single = np.ndim(pos1) == 1
+            # Python floats, NumPy scalars would make doIntersect several times slower
+            angles, pos1, pos2 = np.asarray(angles, dtype=float).tolist(), np.asarray(pos1, dtype=float).tolist(), np.asarray(pos2, dtype=float).tolist()
+            return np.array([self.can_see(angle, pos1 if single else pos1[i], pos2[i]) for i, angle in enumerate(angles)], dtype=bool)
+
+        angles = np.asarray(angles, dtype=float)
+        pos1 = np.asarray(pos1, dtype=float)
+        pos2 = np.asarray(pos2, dtype=float)
+
+        visible = (angles >= -FOV_ANGLE) & (angles <= FOV_ANGLE)
+
+        # Walls are only tested for sightlines inside the field of view
+        if visible.any():
+            visible[visible] = ~self.blocked(pos1 if pos1.ndim == 1 else pos1[visible], pos2[visible])
+
+        return visible
+
+def calc_angle_matrix(pos1, yaw1, pos2):
+    # utils.calc_angle_robots from every pos1 (with its yaw) to every pos2, (len(pos1), len(pos2))
+    pos_angle = np.arctan2(pos2[None, :, 1] - pos1[:, None, 1], pos2[None, :, 0] - pos1[:, None, 0])
+    pos_angle = np.where(pos_angle < 0, pos_angle + 2 * pi, pos_angle)
+    pos_angle = (pos_angle - yaw1[:, None]) % (2 * pi)
+
+    return np.where(pos_angle > pi, pos_angle - 2 * pi, pos_angle)
+
+def clip(x0, y0, x1, y1, xmin, ymin, xmax, ymax):
+    # Liang-Barsky, parameter interval of the segment inside the box or None
+    t0, t1 = 0.0, 1.0
+
+    for p, q in ((x0 - x1, x0 - xmin), (x1 - x0, xmax - x0), (y0 - y1, y0 - ymin), (y1 - y0, ymax - y0)):
+        if p == 0:
+            if q < 0:
+                return None
+            continue
+
+        t = q / p
+
+        if p < 0:
+            t0 = max(t0, t)
+        else:
+            t1 = min(t1, t)
+
+        if t0 > t1:
+            return None
+
+    return t0, t1
+
+class WallGrid:
+    """
+    Uniform grid over the walls' bounding box. Each wall is registered in every cell it touches,
+    cells padded by GRID_EPS so walls on a cell border are in both cells, and sightlines are
+    traversed cell by cell (DDA). Only the walls found along the way are tested, with the same
+    test as utils.doIntersect, so results are exact.
+    """
+    def __init__(self, walls=WALLS, cell_size=None):
+        self.walls = [[list(map(float, wall[0])), list(map(float, wall[1]))] for wall in walls]
+
+        xs = [point[0] for wall in self.walls for point in wall]
+        ys = [point[1] for wall in self.walls for point in wall]
+        self.xmin, self.ymin = min(xs) - GRID_EPS, min(ys) - GRID_EPS
+        self.xmax, self.ymax = max(xs) + GRID_EPS, max(ys) + GRID_EPS
+
+        # About one wall per cell by default
+        if cell_size is None:
+            cell_size = max(self.xmax - self.xmin, self.ymax - self.ymin) / max(1, ceil(sqrt(len(self.walls))))
+
+        self.cell_size = cell_size
+        self.nx = max(1, ceil((self.xmax - self.xmin) / cell_size))
+        self.ny = max(1, ceil((self.ymax - self.ymin) / cell_size))
+        self.cells = [[] for i in range(self.nx * self.ny)]
+
+        for id, wall in enumerate(self.walls):
+            self.register(id, wall)
+
+    def __len__(self):
+        return len(self.walls)
+
+    def cell_range(self, value, low, n):
+        return min(n - 1, max(0, floor((value - low) / self.cell_size)))
+
+    def register(self, id, wall):
+        (ax, ay), (bx, by) = wall
+
+        i0 = self.cell_range(min(ax, bx) - GRID_EPS, self.xmin, self.nx)
+        i1 = self.cell_range(max(ax, bx) + GRID_EPS, self.xmin, self.nx)
+        j0 = self.cell_range(min(ay, by) - GRID_EPS, self.ymin, self.ny)
+        j1 = self.cell_range(max(ay, by) + GRID_EPS, self.ymin, self.ny)
+
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                xmin = self.xmin + i * self.cell_size - GRID_EPS
+                ymin = self.ymin + j * self.cell_size - GRID_EPS
+
+                if clip(ax, ay, bx, by, xmin, ymin, xmin + self.cell_size + 2 * GRID_EPS, ymin + self.cell_size + 2 * GRID_EPS) is not None:
+                    self.cells[i * self.ny + j].append(id)
+
+    def traverse(self, x0, y0, x1, y1):
+        # Cells crossed by the segment, both side cells are included when it goes through a corner
+        interval = clip(x0, y0, x1, y1, self.xmin, self.ymin, self.xmax, self.ymax)
+
+        if interval is None:
+            return
+
+        dx = x1 - x0
+        dy = y1 - y0
+        t, t_end = interval
+
+        i = self.cell_range(x0 + t * dx, self.xmin, self.nx)
+        j = self.cell_range(y0 + t * dy, self.ymin, self.ny)
+        step_i = 1 if dx > 0 else -1
+        step_j = 1 if dy > 0 else -1
+
+        t_max_x = ((self.xmin + (i + (dx > 0)) * self.cell_size) - x0) / dx if dx != 0 else inf
+        t_max_y = ((self.ymin + (j + (dy > 0)) * self.cell_size) - y0) / dy if dy != 0 else inf
+        t_delta_x = self.cell_size / abs(dx) if dx != 0 else inf
+        t_delta_y = self.cell_size / abs(dy) if dy != 0 else inf
+
+        yield i * self.ny + j
+
+        while min(t_max_x, t_max_y) <= t_end:
+            if t_max_x == t_max_y:
+                if 0 <= i + step_i < self.nx:
+                    yield (i + step_i) * self.ny + j
+                if 0 <= j + step_j < self.ny:
+                    yield i * self.ny + j + step_j
+
+                i += step_i
+                j += step_j
+                t_max_x += t_delta_x
+                t_max_y += t_delta_y
+
+            elif t_max_x < t_max_y:
+                i += step_i
+                t_max_x += t_delta_x
+
+            else:
+                j += step_j
+                t_max_y += t_delta_y
+
+            if not (0 <= i < self.nx and 0 <= j < self.ny):
+                return
+
+            yield i * self.ny + j
+
+    def candidates(self, pos1, pos2):
+        found = set()
+
+        for cell in self.traverse(pos1[0], pos1[1], pos2[0], pos2[1]):
+            found.update(self.cells[cell])
+
+        return found
+
+    def blocked_one(self, pos1, pos2):
+        for id in self.candidates(pos1, pos2):
+            if doIntersect(pos1, pos2, self.walls[id][0], self.walls[id][1]):
+                return True
+
+        return False
+
+    def blocked(self, pos1, pos2):
+        pos1 = np.asarray(pos1, dtype=float).reshape(-1, np.shape(pos1)[-1]).tolist()
+        pos2 = np.asarray(pos2, dtype=float).reshape(-1, np.shape(pos2)[-1]).tolist()
+
+        return np.array([self.blocked_one(p, q) for p, q in zip(pos1, pos2)], dtype=bool)
+
+    def can_see(self, angle, pos1, pos2):
+        if not -FOV_ANGLE <= angle <= FOV_ANGLE:
+            return False
+
+        return not self.blocked_one(pos1, pos2)
+
+    def can_see_batch(self, angles, pos1, pos2):
+        pos2 = np.asarray(pos2, dtype=float)
+        pos1 = np.broadcast_to(np.asarray(pos1, dtype=float), pos2.shape)
+
+        return np.array([self.can_see(angle, p, q) for angle, p, q in zip(np.asarray(angles, dtype=float).tolist(), pos1.tolist(), pos2.tolist())], dtype=bool)
+
+def wall_index(walls):
+    # Testing every wall at once is faster until there are many of them
+    if len(walls) >= WALL_GRID_MIN:
+        return WallGrid(walls)
+
+    return WallSet(walls)
+
+ARENA_WALLS = wall_index(WALLS)
+
+def can_see(angle, pos1, pos2):
+    return ARENA_WALLS.can_see(angle, pos1, pos2)
+
+def can_see_batch(angles, pos1, pos2):
+    return ARENA_WALLS.can_see_batch(angles, pos1, pos2)
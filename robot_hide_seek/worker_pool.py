@@ -0,0 +1,172 @@
+'''
+Runs several Gazebo simulations + training environments on the same machine.
+Each worker gets its own ROS_DOMAIN_ID and GAZEBO_MASTER_URI port, so topics
+and services from different simulations never mix.
+Transitions are streamed back to the learner process through a local pipe.
+'''
+
+import os
+import sys
+import signal
+import time
+import subprocess
+import multiprocessing
+import queue
+
+from robot_hide_seek.utils import *
+
+ROLES = {
+    'seeker': ('seekerEnv-v0', './training_results/seeker', N_SEEKERS),
+    'hider': ('hiderEnv-v0', './training_results/hider', N_HIDERS),
+}
+
+def round_observation(observation):
+    res = []
+
+    for sensor in observation[0]:
+        res.append(round(sensor, 2))
+
+    for _ in range(len(observation[0]), LIDAR_SECTORS):
+        res.append(float('inf'))
+
+    res.append(round(observation[1], 2))
+    res.append(round(observation[2], 2))
+    res.append(observation[3])
+
+    return res
+
+def run_worker(worker_id, role, domain_id, gazebo_port, transitions, exploration_rate, heartbeats, stop):
+    # Must be set before rclpy and Gazebo are started in this process
+    os.environ['ROS_DOMAIN_ID'] = str(domain_id)
+    os.environ['GAZEBO_MASTER_URI'] = 'http://localhost:' + str(gazebo_port)
+    os.environ.setdefault('HIDE_SEEK_WORLD', 'hide_seek_2x2.model')
+
+    # Terminating the worker must also bring its simulation down
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+
+    sim = subprocess.Popen(
+        ['ros2', 'launch', 'robot_hide_seek', 'hide_seek.launch.py', 'gui:=False'],
+        env=os.environ.copy(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+    try:
+        time.sleep(WORKER_SIM_STARTUP)
+
+        import gym
+        from robot_hide_seek import seeker_env, hider_env, deepqlearn, model_watcher
+
+        env_id, save_path, n_agents = ROLES[role]
+        env = gym.make(env_id)
+
+        # Built once, later checkpoints are loaded into the same model
+        deepQ = deepqlearn.DeepQ(OBSERVATION_SIZE, 5, save_path=save_path)
+        deepQ.initPlay()
+        loaded = None
+
+        while not stop.is_set():
+            # Pick up the weights the learner saved since the last episode, once it finished writing them
+            version = model_watcher.checkpoint_version(save_path)
+
+            if version is not None and version != loaded and time.time() - version >= MODEL_WATCH_SETTLE:
+                try:
+                    deepQ.reloadWeights()
+                except Exception as error:
+                    print('Worker ' + str(worker_id) + ' keeps its weights, could not load ' + save_path + ': ' + str(error))
+                loaded = version
+
+            observations = [round_observation(observation) for observation in env.reset()]
+            current_agent = 0
+            done = False
+
+            while not done and not stop.is_set():
+                if sim.poll() is not None:
+                    raise RuntimeError('Gazebo exited with code ' + str(sim.returncode))
+
+                qValues = deepQ.getQValues(observations[current_agent][:])
+                action = deepQ.selectAction(qValues, exploration_rate.value)
+
+                newObservation, reward, done, info = env.step(action)
+                newObservation = round_observation(newObservation)
+
+                transitions.put((worker_id, observations[current_agent], action, reward, newObservation, done, info['repeat']))
+                heartbeats[worker_id] = time.time()
+
+                observations[current_agent] = newObservation
+                current_agent = (current_agent + 1) % n_agents
+
+    finally:
+        sim.terminate()
+        sim.wait()
+
+class WorkerPool():
+
+    def __init__(self, role, n_workers=N_WORKERS):
+        self.role = role
+        self.n_workers = n_workers
+
+        # Spawned processes do not inherit rclpy or TensorFlow state from the learner
+        self.context = multiprocessing.get_context('spawn')
+        self.transitions = self.context.Queue(WORKER_QUEUE_SIZE)
+        self.exploration_rate = self.context.Value('d', 1.0)
+        self.heartbeats = self.context.Array('d', self.n_workers)
+        self.stop = self.context.Event()
+
+        self.workers = [None for i in range(self.n_workers)]
+        self.restart_at = [0 for i in range(self.n_workers)]
+        self.restarts = [0 for i in range(self.n_workers)]
+
+    def start_worker(self, i):
+        worker = self.context.Process(
+            target=run_worker,
+            args=(i, self.role, WORKER_BASE_DOMAIN_ID + i, WORKER_BASE_GAZEBO_PORT + i,
+                  self.transitions, self.exploration_rate, self.heartbeats, self.stop),
+            daemon=True
+        )
+        # Startup counts as activity, the simulation takes a while to come up
+        self.heartbeats[i] = time.time() + WORKER_SIM_STARTUP
+        worker.start()
+        self.workers[i] = worker
+
+    def start(self):
+        for i in range(self.n_workers):
+            self.start_worker(i)
+
+    def supervise(self):
+        now = time.time()
+
+        for i, worker in enumerate(self.workers):
+            if worker.is_alive():
+                # A worker stuck waiting on a dead simulation never exits by itself
+                if now - self.heartbeats[i] > WORKER_TIMEOUT:
+                    print("Worker " + str(i) + " stopped responding. Terminating...")
+                    worker.terminate()
+                continue
+
+            if self.restart_at[i] == 0:
+                print("Worker " + str(i) + " exited with code " + str(worker.exitcode) + ". Restarting...")
+                self.restart_at[i] = now + WORKER_RESTART_DELAY
+
+            elif now >= self.restart_at[i]:
+                self.restart_at[i] = 0
+                self.restarts[i] += 1
+                self.start_worker(i)
+
+    def get_transition(self, timeout=1.0):
+        try:
+            return self.transitions.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def set_exploration_rate(self, rate):
+        self.exploration_rate.value = rate
+
+    def shutdown(self):
+        self.stop.set()
+
+        for worker in self.workers:
+            worker.join(WORKER_SIM_STARTUP)
+
+            if worker.is_alive():
+                worker.terminate()
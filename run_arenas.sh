@@ -0,0 +1,6 @@
+#!/bin/sh
+
+echo "Running world: arenas (generate it with: ros2 run robot_hide_seek make_arena_world <n_arenas>)"
+export HIDE_SEEK_WORLD="hide_seek_arenas.model"
+
+ros2 launch robot_hide_seek hide_seek.launch.py
@@ -0,0 +1,3 @@
+#!/bin/bash
+
+ros2 run robot_hide_seek game --ros-args -p n_hiders:=2 -p n_seekers:=2
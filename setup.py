@@ -27,10 +27,20 @@ setup(
             'hider = robot_hide_seek.hider:main',
             'seeker = robot_hide_seek.seeker:main',
             'game_controller = robot_hide_seek.game_controller:main',
+            'game = robot_hide_seek.game:main',
             'train_hider = robot_hide_seek.train_hider:main',
             'train_seeker = robot_hide_seek.train_seeker:main',
             'deeptrain_hider = robot_hide_seek.deeptrain_hider:main',
             'deeptrain_seeker = robot_hide_seek.deeptrain_seeker:main',
+            'deeptrain_parallel = robot_hide_seek.deeptrain_parallel:main',
+            'make_arena_world = robot_hide_seek.make_arena_world:main',
+            'fake_gazebo = robot_hide_seek.fake_gazebo:main',
+            'bench_controller = robot_hide_seek.bench_controller:main',
+            'bench_game = robot_hide_seek.bench_game:main',
+            'bench_intra = robot_hide_seek.bench_intra:main',
+            'bench_visibility = robot_hide_seek.bench_visibility:main',
+            'build_los_table = robot_hide_seek.los_table:main',
+            'policy_server = robot_hide_seek.policy_server:main',
         ],
     },
 )